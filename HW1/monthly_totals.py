@@ -8,16 +8,25 @@ et savoir pivoter ces objets pour atteindre vos objectifs.
 Toutes les zones qui nécessitent des travaux sont marquées d'une étiquette "TODO".
 """
 
+import csv
+import io
+import os
 import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from scipy.spatial.distance import pdist, squareform
 from geopy import distance
+from csv_snapshot import read_csv_snapshot
 
-from typing import Tuple
+from typing import List, Tuple
 
 
-def get_precip_data(fp: str = "data/precipitation.csv") -> pd.DataFrame:
-    return pd.read_csv(fp, parse_dates=[2])
+def get_precip_data(fp: str = "data/precipitation.csv", columns: List[str] = None) -> pd.DataFrame:
+    """
+    Lit le CSV des précipitations à partir de son instantané par colonnes (voir `read_csv_snapshot()`) : seul le
+    premier appel analyse le texte et les dates. `columns` limite la lecture aux colonnes utilisées.
+    """
+    return read_csv_snapshot(fp, columns=columns, parse_dates=[2])
 
 
 def date_to_month(d: pd.Timestamp) -> str:
@@ -55,6 +64,285 @@ def pivot_months_pandas(data: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]
     return monthly, counts
 
 
+def pivot_months_vectorized(data: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Même résultat que `pivot_months_pandas()`, sans aucune boucle Python par ligne.
+
+    Le mois de chaque observation est un code entier (année * 12 + mois - 1) obtenu en convertissant les dates en
+    `datetime64[M]`, les stations et les mois sont factorisés, puis les totaux et les décomptes sont calculés en une
+    seule passe chacun avec `np.bincount` sur le code combiné station × mois. Les précipitations manquantes (NaN) ne
+    sont pas comptées, comme avec `groupby().sum()` et `groupby().count()`.
+    """
+    month_codes = _month_codes(data["date"])
+
+    station_idx, stations = pd.factorize(data["name"], sort=True)
+
+    # Les mois présents sont dans un petit intervalle : une table de correspondance évite de trier toutes les lignes.
+    first = month_codes.min()
+    present = np.bincount(month_codes - first) > 0
+    months = np.flatnonzero(present) + first
+    month_idx = (np.cumsum(present) - 1)[month_codes - first]
+
+    precipitation = data["precipitation"].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(precipitation)
+    cells = (station_idx * len(months) + month_idx)[valid]
+    shape = (len(stations), len(months))
+
+    precip_total = np.bincount(cells, weights=precipitation[valid], minlength=shape[0] * shape[1]).reshape(shape)
+    obs_count = np.bincount(cells, minlength=shape[0] * shape[1]).reshape(shape)
+
+    return _month_frames(precip_total, obs_count, list(stations), _month_labels(months))
+
+
+def _month_codes(dates: pd.Series) -> np.ndarray:
+    months_since_1970 = pd.to_datetime(dates).to_numpy().astype("datetime64[M]").astype(np.int64)
+    return months_since_1970 + 1970 * 12
+
+
+def _month_labels(month_codes: np.ndarray) -> list:
+    return ["%04i-%02i" % (code // 12, code % 12 + 1) for code in month_codes]
+
+
+def _month_frames(precip_total: np.ndarray, obs_count: np.ndarray, stations: list, months: list):
+    totals = pd.DataFrame(data=np.round(precip_total, 1), index=stations, columns=months)
+    totals.index.name = "name"
+    totals.columns.name = "month"
+
+    counts = pd.DataFrame(data=obs_count.astype(int), index=stations, columns=months)
+    counts.index.name = "name"
+    counts.columns.name = "month"
+
+    return totals, counts
+
+
+class MonthlyAccumulator:
+    """
+    Totaux et décomptes mensuels par station, accumulés morceau par morceau.
+
+    Les stations et les mois rencontrés reçoivent chacun un numéro de ligne ou de colonne dans deux tableaux
+    (totaux, décomptes) qui grandissent au besoin : la mémoire utilisée dépend du nombre de stations × mois, pas du
+    nombre d'observations. Des accumulateurs partiels (p. ex. calculés en parallèle) se combinent avec `merge()`.
+    """
+
+    def __init__(self):
+        self.station_to_row = {}
+        self.month_to_col = {}
+        self.totals = np.zeros((0, 0), dtype=np.float64)
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+
+    def _rows(self, stations) -> np.ndarray:
+        for station in stations:
+            self.station_to_row.setdefault(station, len(self.station_to_row))
+        return np.array([self.station_to_row[station] for station in stations], dtype=np.int64)
+
+    def _cols(self, months) -> np.ndarray:
+        for month in months:
+            self.month_to_col.setdefault(int(month), len(self.month_to_col))
+        return np.array([self.month_to_col[int(month)] for month in months], dtype=np.int64)
+
+    def _grow(self) -> None:
+        # Double la capacité pour que la croissance coûte O(1) amorti par station ou mois ajouté.
+        n_rows, n_cols = len(self.station_to_row), len(self.month_to_col)
+        if n_rows <= self.totals.shape[0] and n_cols <= self.totals.shape[1]:
+            return
+        shape = (max(n_rows, 2 * self.totals.shape[0]), max(n_cols, 2 * self.totals.shape[1]))
+        for name in ("totals", "counts"):
+            old = getattr(self, name)
+            new = np.zeros(shape, dtype=old.dtype)
+            new[:old.shape[0], :old.shape[1]] = old
+            setattr(self, name, new)
+
+    def add(self, data: pd.DataFrame) -> None:
+        """
+        Ajoute les observations d'un DataFrame avec les colonnes "name", "date" et "precipitation".
+        """
+        station_idx, stations = pd.factorize(data["name"])
+        month_idx, months = pd.factorize(_month_codes(data["date"]))
+        rows = self._rows(stations)
+        cols = self._cols(months)
+        self._grow()
+
+        precipitation = data["precipitation"].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(precipitation)
+        cells = (station_idx * len(months) + month_idx)[valid]
+        shape = (len(stations), len(months))
+        size = shape[0] * shape[1]
+        block = np.ix_(rows, cols)
+        self.totals[block] += np.bincount(cells, weights=precipitation[valid], minlength=size).reshape(shape)
+        self.counts[block] += np.bincount(cells, minlength=size).reshape(shape)
+
+    def merge(self, other: "MonthlyAccumulator") -> None:
+        """
+        Ajoute les totaux et décomptes d'un autre accumulateur à celui-ci.
+        """
+        n_rows, n_cols = len(other.station_to_row), len(other.month_to_col)
+        rows = self._rows(list(other.station_to_row))
+        cols = self._cols(list(other.month_to_col))
+        self._grow()
+
+        block = np.ix_(rows, cols)
+        self.totals[block] += other.totals[:n_rows, :n_cols]
+        self.counts[block] += other.counts[:n_rows, :n_cols]
+
+    def frames(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Retourne (totaux, décomptes) avec les stations et les mois triés, comme `pivot_months_pandas()`.
+        """
+        stations = sorted(self.station_to_row)
+        months = sorted(self.month_to_col)
+
+        block = self._order()
+        return _month_frames(self.totals[block], self.counts[block], stations, _month_labels(np.array(months)))
+
+
+    def save(self, path: str, **extra) -> None:
+        """
+        Sauvegarde l'accumulateur dans un fichier `.npz`. Comme dans `main()`, les clés "totals" et "counts" contiennent
+        les tableaux arrondis attendus par `np_summary.py` ; les sommes non arrondies, les stations et les mois
+        permettent de reprendre l'accumulation avec `load()`.
+
+        Le fichier est écrit sous un nom temporaire puis renommé, pour qu'une interruption pendant l'écriture ne
+        laisse jamais un fichier illisible à la place de l'état précédent.
+        """
+        totals, counts = self.frames()
+        tmp_path = "%s.%d.tmp" % (path, os.getpid())
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    totals=totals.values,
+                    counts=counts.values,
+                    raw_totals=self.totals[self._order()],
+                    raw_counts=self.counts[self._order()],
+                    stations=np.array(totals.index, dtype=str),
+                    months=np.array(sorted(self.month_to_col), dtype=np.int64),
+                    **extra,
+                )
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def load(cls, path: str) -> Tuple["MonthlyAccumulator", dict]:
+        """
+        Recharge un accumulateur sauvegardé avec `save()`. Retourne aussi les valeurs supplémentaires sauvegardées.
+        """
+        accumulator = cls()
+        with np.load(path) as data:
+            accumulator.station_to_row = {station: i for i, station in enumerate(data["stations"].tolist())}
+            accumulator.month_to_col = {month: i for i, month in enumerate(data["months"].tolist())}
+            accumulator.totals = data["raw_totals"]
+            accumulator.counts = data["raw_counts"]
+            known = {"totals", "counts", "raw_totals", "raw_counts", "stations", "months"}
+            extra = {key: data[key] for key in data.files if key not in known}
+        return accumulator, extra
+
+    def _order(self):
+        rows = [self.station_to_row[station] for station in sorted(self.station_to_row)]
+        cols = [self.month_to_col[month] for month in sorted(self.month_to_col)]
+        return np.ix_(rows, cols)
+
+
+def monthly_totals_streaming(
+    fp: str = "data/precipitation.csv", chunksize: int = 1_000_000
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Même résultat que `pivot_months_pandas(get_precip_data(fp))`, en lisant le CSV par morceaux de `chunksize` lignes
+    plutôt qu'en entier : la mémoire est bornée par la taille d'un morceau plus les tableaux stations × mois.
+    """
+    accumulator = MonthlyAccumulator()
+    reader = pd.read_csv(fp, usecols=["name", "date", "precipitation"], parse_dates=["date"], chunksize=chunksize)
+    for chunk in reader:
+        accumulator.add(chunk)
+
+    return accumulator.frames()
+
+
+def update_monthly_totals(
+    fp: str = "data/precipitation.csv",
+    state_path: str = "data/monthdata.npz",
+    block_size: int = 64 * 1024 * 1024,
+    wait_for_newline: bool = False,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Met à jour les totaux et décomptes mensuels sauvegardés dans `state_path` avec les lignes ajoutées à la fin de
+    `fp` depuis le dernier appel, puis retourne (totaux, décomptes) comme `pivot_months_pandas()`.
+
+    L'état contient la position (en octets) de la fin de la dernière ligne complète déjà lue : seules les lignes
+    suivantes sont lues, donc une mise à jour quotidienne coûte proportionnellement aux nouvelles données et non à
+    tout l'historique. Si le fichier a été réécrit plutôt que complété (en-tête différent ou fichier plus court), tout
+    est recalculé.
+
+    Une dernière ligne sans retour à la ligne final est comptée, comme le fait `pd.read_csv()`. Si `fp` peut être lu
+    pendant qu'un autre programme y écrit, `wait_for_newline=True` laisse plutôt cette ligne (peut-être incomplète)
+    pour le prochain appel ; les lignes doivent alors se terminer par "\n".
+    """
+    accumulator, offset, header = MonthlyAccumulator(), 0, b""
+    if os.path.exists(state_path):
+        accumulator, extra = MonthlyAccumulator.load(state_path)
+        offset, header = int(extra["offset"]), extra["header"].tobytes()
+
+    with open(fp, "rb") as f:
+        first_line = f.readline()
+        if first_line != header or os.path.getsize(fp) < offset:
+            accumulator, offset, header = MonthlyAccumulator(), len(first_line), first_line
+
+        names = next(csv.reader([header.decode()]))
+        f.seek(offset)
+        pending = b""
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            block = pending + block
+            end = block.rfind(b"\n") + 1
+            pending = block[end:]
+            if end:
+                rows = pd.read_csv(
+                    io.BytesIO(block[:end]), header=None, names=names,
+                    usecols=["name", "date", "precipitation"], parse_dates=["date"],
+                )
+                accumulator.add(rows)
+                offset += end
+
+        if pending and not wait_for_newline:
+            rows = pd.read_csv(
+                io.BytesIO(pending), header=None, names=names,
+                usecols=["name", "date", "precipitation"], parse_dates=["date"],
+            )
+            accumulator.add(rows)
+            offset += len(pending)
+
+    accumulator.save(state_path, offset=np.array(offset), header=np.frombuffer(header, dtype=np.uint8))
+    return accumulator.frames()
+
+
+def synthetic_precip_data(
+    n_rows: int, n_stations: int = 50, n_days: int = 365, start: str = "2016-01-01", seed: int = 0
+) -> pd.DataFrame:
+    """
+    Génère `n_rows` observations aléatoires réparties sur `n_stations` stations et `n_days` jours à partir de `start`,
+    avec les mêmes colonnes que `get_precip_data()`, pour mesurer les performances à plus grande échelle. Environ 5%
+    des précipitations sont manquantes (NaN).
+    """
+    rng = np.random.default_rng(seed)
+    stations = np.array(["STATION %04i" % i for i in range(n_stations)], dtype=object)
+
+    station = rng.integers(0, n_stations, size=n_rows)
+    precipitation = np.round(rng.gamma(0.5, 6.0, size=n_rows), 1)
+    precipitation[rng.random(n_rows) < 0.05] = np.nan
+
+    return pd.DataFrame({
+        "station": station,
+        "name": stations[station],
+        "date": pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, n_days, size=n_rows), unit="D"),
+        "latitude": rng.uniform(42, 60, size=n_stations)[station],
+        "longitude": rng.uniform(-140, -52, size=n_stations)[station],
+        "precipitation": precipitation,
+    })
+
+
 def pivot_months_loops(data: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Créez des totaux mensuels de précipitations pour chaque station dans l'ensemble de données.
@@ -141,6 +429,119 @@ def compute_pairwise(df: pd.DataFrame, func: callable) -> pd.DataFrame:
     return new_df
 
 
+def euclidean_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Métrique vectorisée : distances euclidiennes entre chaque ligne de `a` (m × d) et chaque ligne de `b` (n × d).
+    """
+    return np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2))
+
+
+def iter_pairwise_blocks(x: np.ndarray, metric: callable, block_rows: int = 512):
+    """
+    Génère (début, fin, bloc) où `bloc` contient `metric` appliquée aux lignes x[début:fin] et à toutes les lignes de
+    `x`. `metric` est vectorisée : elle reçoit deux tableaux (m × d) et (n × d) et retourne le tableau (m × n).
+
+    Seul un bloc de `block_rows` lignes est en mémoire à la fois, ce qui permet de traiter des matrices qui ne
+    tiendraient pas en mémoire.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    for start in range(0, len(x), block_rows):
+        stop = min(start + block_rows, len(x))
+        yield start, stop, metric(x[start:stop], x)
+
+
+def pairwise_matrix(
+    x: np.ndarray,
+    metric: callable,
+    block_rows: int = 512,
+    out: str = None,
+    workers: int = 1,
+    symmetric: bool = False,
+) -> np.ndarray:
+    """
+    Matrice n × n de `metric` (vectorisée, voir `iter_pairwise_blocks()`) entre toutes les lignes de `x`, calculée
+    par blocs de `block_rows` lignes répartis sur `workers` fils d'exécution (NumPy libère le GIL pendant les calculs).
+
+    Si `out` est un chemin, la matrice est écrite dans un fichier `.npy` projeté en mémoire (`np.lib.format.open_memmap`)
+    plutôt qu'en mémoire vive. Si la métrique est symétrique (`symmetric=True`), chaque bloc n'est calculé qu'à partir
+    de la diagonale puis recopié de l'autre côté. Les blocs écrivent dans des zones disjointes de la matrice.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if out is None:
+        result = np.zeros((n, n), dtype=np.float64)
+    else:
+        result = np.lib.format.open_memmap(out, mode="w+", dtype=np.float64, shape=(n, n))
+
+    def compute(start: int) -> None:
+        stop = min(start + block_rows, n)
+        if not symmetric:
+            result[start:stop] = metric(x[start:stop], x)
+            return
+        size = stop - start
+        block = metric(x[start:stop], x[start:])
+        result[start:stop, start:] = block
+        result[stop:, start:stop] = block[:, size:].T
+        # Dans le bloc diagonal, d(p, q) et d(q, p) peuvent différer au dernier bit près : on garde le triangle
+        # supérieur pour que la matrice soit exactement symétrique.
+        diagonal = block[:, :size]
+        result[start:stop, start:stop] = np.triu(diagonal) + np.triu(diagonal, 1).T
+
+    starts = range(0, n, block_rows)
+    if workers > 1:
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(compute, starts))
+    else:
+        for start in starts:
+            compute(start)
+
+    if out is not None:
+        result.flush()
+    return result
+
+
+def pairwise_topk(
+    x: np.ndarray, metric: callable, k: int, block_rows: int = 512, workers: int = 1
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pour chaque ligne de `x`, retourne les indices et les valeurs de ses `k` plus proches voisins selon `metric`
+    (en s'excluant elle-même), triés par distance croissante, sans jamais construire la matrice n × n complète.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    k = min(k, n - 1)
+    indices = np.empty((n, k), dtype=np.int64)
+    values = np.empty((n, k), dtype=np.float64)
+
+    def compute(start: int) -> None:
+        stop = min(start + block_rows, n)
+        block = metric(x[start:stop], x)
+        rows = np.arange(stop - start)
+        block[rows, rows + start] = np.inf
+        nearest = np.argpartition(block, k - 1, axis=1)[:, :k] if k < n else np.argsort(block, axis=1)
+        order = np.argsort(np.take_along_axis(block, nearest, axis=1), axis=1)
+        indices[start:stop] = np.take_along_axis(nearest, order, axis=1)
+        values[start:stop] = np.take_along_axis(block, indices[start:stop], axis=1)
+
+    starts = range(0, n, block_rows)
+    if workers > 1:
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(compute, starts))
+    else:
+        for start in starts:
+            compute(start)
+
+    return indices, values
+
+
+def compute_pairwise_blocked(df: pd.DataFrame, metric: callable, **kwargs) -> pd.DataFrame:
+    """
+    Comme `compute_pairwise()`, mais avec une métrique vectorisée et le moteur par blocs `pairwise_matrix()` (les
+    arguments supplémentaires lui sont passés). Contrairement à `pdist`, la diagonale vaut `metric(x, x)`.
+    """
+    return pd.DataFrame(pairwise_matrix(df.values, metric, **kwargs), index=df.index, columns=df.index)
+
+
 def geodesic(latlon1, latlon2) -> int:
     """
     Définit une métrique entre deux points ; dans notre cas, nos deux points sont des coordonnées latitude/longitude.
@@ -155,11 +556,123 @@ def geodesic(latlon1, latlon2) -> int:
     return int(distance.distance(tuple(latlon1), tuple(latlon2)).km)
 
 
-def compute_pairwise_distances(df: pd.DataFrame) -> pd.DataFrame:
+# Rayon moyen de la Terre (km) pour la formule de haversine, et ellipsoïde WGS-84 (m) comme dans geopy.
+EARTH_RADIUS_KM = 6371.0088
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Distance (km) sur une sphère entre des tableaux de points (en degrés), calculée en une seule opération NumPy.
+    L'erreur par rapport à l'ellipsoïde est d'au plus ~0.5%.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+
+
+def vincenty_km(lat1, lon1, lat2, lon2, max_iter: int = 200, tol: float = 1e-12) -> np.ndarray:
+    """
+    Distance (km) sur l'ellipsoïde WGS-84 entre des tableaux de points (en degrés) avec la formule inverse de
+    Vincenty, itérée sur tous les points à la fois :
+        - https://en.wikipedia.org/wiki/Vincenty%27s_formulae
+
+    Le résultat est à moins de 1e-6 km (1 mm) de `geopy.distance.distance` (algorithme de Karney). La formule ne
+    converge pas pour des points presque antipodaux : ces paires (rares) sont calculées avec geopy.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (lat1, lon1, lat2, lon2)))
+    shape = lat1.shape
+    lat1, lon1, lat2, lon2 = (x.ravel() for x in (lat1, lon1, lat2, lon2))
+    f = WGS84_F
+    b = (1 - f) * WGS84_A
+
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sinU1, cosU1, sinU2, cosU2 = np.sin(U1), np.cos(U1), np.sin(U2), np.cos(U2)
+
+    sin_sigma, cos_sigma, sigma = np.empty_like(L), np.empty_like(L), np.empty_like(L)
+    cos2_alpha, cos_2sigma_m = np.empty_like(L), np.empty_like(L)
+
+    # Seules les paires qui n'ont pas encore convergé sont recalculées à chaque itération.
+    lam = L.copy()
+    active = np.arange(L.size)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(max_iter):
+            if active.size == 0:
+                break
+            l, su1, cu1, su2, cu2 = lam[active], sinU1[active], cosU1[active], sinU2[active], cosU2[active]
+            sin_lam, cos_lam = np.sin(l), np.cos(l)
+            s_sigma = np.hypot(cu2 * sin_lam, cu1 * su2 - su1 * cu2 * cos_lam)
+            c_sigma = su1 * su2 + cu1 * cu2 * cos_lam
+            sig = np.arctan2(s_sigma, c_sigma)
+            # Points confondus (sin_sigma = 0) et géodésiques équatoriales (cos2_alpha = 0) : termes nuls.
+            sin_alpha = np.where(s_sigma == 0, 0.0, cu1 * cu2 * sin_lam / s_sigma)
+            c2_alpha = 1 - sin_alpha ** 2
+            c_2sigma_m = np.where(c2_alpha == 0, 0.0, c_sigma - 2 * su1 * su2 / c2_alpha)
+            C = f / 16 * c2_alpha * (4 + f * (4 - 3 * c2_alpha))
+            new_lam = L[active] + (1 - C) * f * sin_alpha * (
+                sig + C * s_sigma * (c_2sigma_m + C * c_sigma * (-1 + 2 * c_2sigma_m ** 2))
+            )
+
+            sin_sigma[active], cos_sigma[active], sigma[active] = s_sigma, c_sigma, sig
+            cos2_alpha[active], cos_2sigma_m[active] = c2_alpha, c_2sigma_m
+            lam[active] = new_lam
+            active = active[~(np.abs(new_lam - l) < tol)]
+
+    u2 = cos2_alpha * (WGS84_A ** 2 - b ** 2) / b ** 2
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+        - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+    ))
+    result = b * A * (sigma - delta_sigma) / 1000
+
+    for i in active:
+        result[i] = distance.distance((lat1[i], lon1[i]), (lat2[i], lon2[i])).km
+    return result.reshape(shape)
+
+
+def pairwise_geodesic(
+    latlon: np.ndarray, method: str = "ellipsoid", block_rows: int = 512, workers: int = 1
+) -> np.ndarray:
+    """
+    Matrice n × n des distances (km) entre les n points (latitude, longitude) de `latlon`, avec `vincenty_km()`
+    (method="ellipsoid") ou `haversine_km()` (method="haversine").
+
+    Les distances sont calculées par blocs de `block_rows` lignes avec `pairwise_matrix()` pour que les tableaux
+    temporaires restent petits même pour 10 000 stations (50 millions de paires).
+    """
+    return pairwise_matrix(latlon, geodesic_metric(method), block_rows=block_rows, workers=workers, symmetric=True)
+
+
+def geodesic_metric(method: str = "ellipsoid") -> callable:
+    """
+    Métrique vectorisée (pour `pairwise_matrix()` ou `pairwise_topk()`) des distances en km entre des tableaux de
+    points (latitude, longitude), avec `vincenty_km()` (method="ellipsoid") ou `haversine_km()` (method="haversine").
+    """
+    kernel = {"ellipsoid": vincenty_km, "haversine": haversine_km}[method]
+
+    def metric(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        result = kernel(a[:, 0, None], a[:, 1, None], b[None, :, 0], b[None, :, 1])
+        # Un point est à distance nulle de lui-même, même si la formule donne un résidu numérique.
+        result[(a[:, None, 0] == b[None, :, 0]) & (a[:, None, 1] == b[None, :, 1])] = 0
+        return result
+
+    return metric
+
+
+def compute_pairwise_distances(df: pd.DataFrame, method: str = "ellipsoid") -> pd.DataFrame:
     """
     Étant donné les fonctions `compute_pairwise()` et `geodesic()` définies ci-dessus,
     calculez la distance entre chacune des stations. L'entrée doit être la trame de données brute
     d'origine chargée du CSV.
+
+    Plutôt que d'appeler `geodesic()` (donc geopy) pour chaque paire, les distances sont calculées toutes à la fois
+    avec `pairwise_geodesic()`, puis tronquées au km comme le fait `geodesic()`. Avec method="haversine", la Terre est
+    considérée comme une sphère (plus rapide, moins précis).
     """
 
     new_df = (
@@ -169,7 +682,9 @@ def compute_pairwise_distances(df: pd.DataFrame) -> pd.DataFrame:
         .sort_index()
     )
 
-    return compute_pairwise(new_df, geodesic)
+    distances = np.trunc(pairwise_geodesic(new_df.values, method))
+
+    return pd.DataFrame(distances, index=new_df.index, columns=new_df.index)
 
 
 def correlation(u, v) -> float:
@@ -201,6 +716,63 @@ def correlation(u, v) -> float:
     return corr
 
 
+def nan_correlation(a: np.ndarray, b: np.ndarray, min_periods: int = 1) -> np.ndarray:
+    """
+    Métrique vectorisée : corrélation de Pearson entre chaque ligne de `a` (m × d) et chaque ligne de `b` (n × d), en
+    ne gardant pour chaque paire que les colonnes où les deux lignes sont valides (non NaN), comme `correlation()` et
+    `DataFrame.corr()`. Les paires ayant moins de `min_periods` colonnes valides en commun valent NaN.
+
+    Au lieu de filtrer les NaN paire par paire, les sommes masquées sont obtenues par des produits matriciels entre les
+    valeurs (NaN remplacés par 0) et les masques de validité :
+
+        n    = Ma · Mbᵀ        (nombre de colonnes valides en commun)
+        Σx   = Xa · Mbᵀ        Σy  = Ma · Xbᵀ
+        Σx²  = Xa² · Mbᵀ       Σy² = Ma · Xb²ᵀ
+        Σxy  = Xa · Xbᵀ
+
+    La corrélation ne change pas si l'on décale une ligne d'une constante : chaque ligne est d'abord centrée sur sa
+    moyenne pour limiter les erreurs d'arrondi de `Σx² / n - (Σx / n)²`.
+    """
+    a_valid = ~np.isnan(a)
+    b_valid = ~np.isnan(b)
+    a_mask = a_valid.astype(np.float64)
+    b_mask = b_valid.astype(np.float64)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        a = np.where(a_valid, a - np.nanmean(a, axis=1, keepdims=True), 0)
+        b = np.where(b_valid, b - np.nanmean(b, axis=1, keepdims=True), 0)
+
+        n = a_mask @ b_mask.T
+        x_avg = (a @ b_mask.T) / n
+        y_avg = (a_mask @ b.T) / n
+        x_var = (a ** 2 @ b_mask.T) / n - x_avg ** 2
+        y_var = (a_mask @ (b ** 2).T) / n - y_avg ** 2
+        cov = (a @ b.T) / n - x_avg * y_avg
+
+        corr = cov / np.sqrt(x_var * y_var)
+
+    # Une variance nulle (ou négative d'un arrondi) ne donne pas de corrélation, comme dans `DataFrame.corr()`.
+    corr[(x_var <= 0) | (y_var <= 0) | (n < max(min_periods, 1))] = np.nan
+    return np.clip(corr, -1, 1)
+
+
+def pairwise_correlation(
+    x: np.ndarray, min_periods: int = 1, block_rows: int = 512, workers: int = 1
+) -> np.ndarray:
+    """
+    Matrice n × n des corrélations de Pearson entre les lignes de `x` (par exemple stations × jours) avec
+    `nan_correlation()`, calculée par blocs de `block_rows` lignes avec `pairwise_matrix()`. La diagonale vaut 1 (sauf
+    pour une ligne constante ou sans assez de valeurs, où elle vaut NaN).
+    """
+    return pairwise_matrix(
+        x,
+        lambda a, b: nan_correlation(a, b, min_periods),
+        block_rows=block_rows,
+        workers=workers,
+        symmetric=True,
+    )
+
+
 def compute_pairwise_correlation(df: pd.DataFrame) -> pd.DataFrame:
     """
 
@@ -214,10 +786,16 @@ def compute_pairwise_correlation(df: pd.DataFrame) -> pd.DataFrame:
     aux fins de cette mission. `pdist` s'attend à ce que la fonction métrique soit une métrique appropriée,
     c'est-à-dire que la distance entre un élément et lui-même est nulle.
 
+    La version d'origine passait chaque paire de stations à `correlation()` avec `compute_pairwise()`. Les mêmes
+    coefficients sont maintenant calculés pour toutes les paires à la fois avec `pairwise_correlation()` ; la diagonale
+    reste à zéro comme avec `pdist`.
     """
     new_df = df.pivot(index="name", columns="date", values="precipitation")
 
-    return compute_pairwise(new_df, correlation)
+    corr = pairwise_correlation(new_df.values)
+    np.fill_diagonal(corr, 0)
+
+    return pd.DataFrame(corr, index=new_df.index, columns=new_df.index)
 
 
 def compute_pairwise_correlation_pandas(df: pd.DataFrame) -> pd.DataFrame:
@@ -265,6 +843,8 @@ def main():
     )
     output = compute_pairwise(test_df, euclidean)
     assert np.allclose(output, expected_output)
+    output = compute_pairwise_blocked(test_df, euclidean_distances, block_rows=2)
+    assert np.allclose(output, expected_output)
 
     # distances par paires
     print(compute_pairwise_distances(data))
@@ -4,7 +4,10 @@ Ce devoir est basé sur [le cours de science des données de Greg Baker à SFU
 Toutes les zones qui nécessitent des travaux sont marquées d'une étiquette "TODO".
 """
 
+import os
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Tuple
 
 
 def city_lowest_precipitation(totals: np.array) -> int:
@@ -53,17 +56,105 @@ def quarterly_precipitation(totals: np.array) -> np.array:
     Calculez les précipitations totales pour chaque trimestre dans chaque ville (c'est-à-dire les totaux pour chaque station sur des groupes de trois mois). Vous pouvez supposer que le nombre de colonnes sera divisible par 3.
 
     Astuce: Utilisez la fonction de reshape pour reformer en un tableau 4n sur 3, additionner et reformer en n sur 4.
+
+    Le tableau peut couvrir plusieurs années : toute suite de mois dont le nombre est un multiple de 3 est acceptée.
     """
-    if totals.shape[1] != 12:
-        raise NotImplementedError("Le tableau d'entrée n'a pas 12 mois!")
+    if totals.shape[1] % 3 != 0:
+        raise NotImplementedError("Le nombre de mois du tableau d'entrée n'est pas un multiple de 3!")
 
-    totals = totals.reshape(-1, 4, 3)
+    totals = totals.reshape(totals.shape[0], -1, 3)
 
     quarterly_totals = np.sum(totals, axis=2)
 
     return quarterly_totals
 
 
+def save_monthdata(folder: str, totals: np.array, counts: np.array) -> None:
+    """
+    Enregistre les totaux et les nombres d'observations (stations × mois) dans `folder`/totals.npy et counts.npy, qui
+    contrairement à un .npz peuvent être projetés en mémoire par `load_monthdata()`.
+    """
+    os.makedirs(folder, exist_ok=True)
+    np.save(os.path.join(folder, "totals.npy"), totals)
+    np.save(os.path.join(folder, "counts.npy"), counts)
+
+
+def load_monthdata(path: str = "data/monthdata.npz") -> Tuple[np.array, np.array]:
+    """
+    Charge les tableaux `totals` et `counts` d'un fichier .npz (lus en mémoire) ou d'un dossier écrit par
+    `save_monthdata()` (projetés en mémoire : seules les lignes utilisées sont lues du disque).
+    """
+    if os.path.isdir(path):
+        return (
+            np.load(os.path.join(path, "totals.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "counts.npy"), mmap_mode="r"),
+        )
+    with np.load(path) as data:
+        return data["totals"], data["counts"]
+
+
+def summarize(
+    totals: np.array, counts: np.array, chunk_rows: int = 4096, workers: int = 1
+) -> Dict[str, np.array]:
+    """
+    Calcule tous les résumés ci-dessus en un seul passage sur des tableaux (stations × mois) couvrant un nombre
+    quelconque d'années, par exemple projetés en mémoire avec `load_monthdata()` :
+
+    - "city_lowest" : `city_lowest_precipitation()` sur tous les mois ;
+    - "month_avg" et "city_avg" : `avg_precipitation_month()` et `avg_precipitation_city()` ;
+    - "quarterly" : `quarterly_precipitation()` (si le nombre de mois est un multiple de 3) ;
+    - "annual" : totaux par station et par année de 12 mois (la dernière peut être incomplète), avec `np.add.reduceat`.
+
+    Les stations sont lues par morceaux de `chunk_rows` lignes, ce qui borne la mémoire utilisée, et les morceaux
+    peuvent être répartis sur `workers` fils d'exécution. Les sommes par mois sont accumulées morceau après morceau,
+    dans l'ordre des stations comme le fait `np.sum(axis=0)`, si bien que les résultats sont identiques à ceux des
+    fonctions ci-dessus.
+    """
+    n_rows, n_months = totals.shape
+    city_total = np.empty(n_rows, dtype=np.result_type(totals.dtype, np.float64))
+    city_count = np.empty(n_rows, dtype=np.result_type(counts.dtype, np.int64))
+    quarterly = np.empty((n_rows, n_months // 3), dtype=city_total.dtype) if n_months % 3 == 0 else None
+    annual = np.empty((n_rows, -(-n_months // 12)), dtype=city_total.dtype)
+    years = np.arange(0, n_months, 12)
+
+    def compute(start: int) -> Tuple[np.array, np.array]:
+        stop = min(start + chunk_rows, n_rows)
+        chunk_totals = np.asarray(totals[start:stop])
+        chunk_counts = np.asarray(counts[start:stop])
+        city_total[start:stop] = np.sum(chunk_totals, axis=1)
+        city_count[start:stop] = np.sum(chunk_counts, axis=1)
+        if quarterly is not None:
+            quarterly[start:stop] = quarterly_precipitation(chunk_totals)
+        annual[start:stop] = np.add.reduceat(chunk_totals, years, axis=1)
+        return chunk_totals, chunk_counts
+
+    month_total = np.zeros(n_months, dtype=city_total.dtype)
+    month_count = np.zeros(n_months, dtype=city_count.dtype)
+
+    def accumulate(chunk_totals: np.array, chunk_counts: np.array) -> None:
+        # Ajouter le morceau à la somme courante ligne par ligne, comme le fait np.sum(axis=0) sur tout le tableau.
+        month_total[:] = np.add.reduce(np.concatenate([month_total[None], chunk_totals]), axis=0)
+        month_count[:] = np.add.reduce(np.concatenate([month_count[None], chunk_counts]), axis=0)
+
+    starts = range(0, n_rows, chunk_rows)
+    if workers > 1:
+        with ThreadPoolExecutor(workers) as executor:
+            # executor.map rend les morceaux dans l'ordre : ils sont accumulés au fur et à mesure par ce fil.
+            for chunk in executor.map(compute, starts):
+                accumulate(*chunk)
+    else:
+        for start in starts:
+            accumulate(*compute(start))
+
+    return {
+        "city_lowest": np.argmin(city_total),
+        "month_avg": month_total / month_count,
+        "city_avg": city_total / city_count,
+        "quarterly": quarterly,
+        "annual": annual,
+    }
+
+
 def main():
     data = np.load("data/monthdata.npz")
     totals = data["totals"]
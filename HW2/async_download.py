@@ -0,0 +1,219 @@
+import asyncio
+import http.client
+import os
+import re
+import threading
+import time
+import yt_dlp
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
+from urllib.parse import urljoin, urlsplit
+
+
+class DownloadResult(NamedTuple):
+    YTID: str
+    path: str
+    ok: bool
+    bytes: int
+    seconds: float
+    attempts: int
+    error: str
+
+
+def youtube_resolver() -> Callable[[str], Tuple[str, dict, str]]:
+    """
+    Return a function resolving a YTID to the URL, HTTP headers and file extension of its best audio stream.
+
+    Each thread keeps its own long-lived yt_dlp.YoutubeDL, so the extractors are initialised once per thread instead
+    of once per video.
+    """
+    local = threading.local()
+
+    def resolve(YTID: str) -> Tuple[str, dict, str]:
+        if not hasattr(local, 'ydl'):
+            local.ydl = yt_dlp.YoutubeDL({'format': 'bestaudio', 'quiet': True})
+        info = local.ydl.extract_info('https://www.youtube.com/watch?v=' + YTID, download=False)
+        return info['url'], info.get('http_headers', {}), info.get('ext', 'audio')
+
+    return resolve
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP(S) connections, reused across requests to the same host.
+    """
+
+    def __init__(self, timeout: float = 30.0):
+        self.timeout = timeout
+        self._idle: Dict[tuple, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop()
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return cls(netloc, timeout=self.timeout)
+
+    def put(self, scheme: str, netloc: str, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._idle.setdefault((scheme, netloc), []).append(connection)
+
+    def close(self) -> None:
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+
+class AsyncDownloader:
+    """
+    Download the audio of many videos concurrently with asyncio.
+
+    Every video is resolved to a stream URL by `resolve` (youtube_resolver() by default) and its bytes are written to
+    <folder>/<YTID>.<ext> as they arrive. Resolution and transfers run in a pool of `max_in_flight` threads, which
+    caps the number of videos in progress, and HTTP connections are reused through a ConnectionPool. `per_host_rate`
+    limits the number of requests started per second on each host. A failed video is retried `retries` times, waiting
+    `retry_delay` * 2 ** (attempt - 1) seconds in between, without holding its slot. Like download_audio(), a video
+    already in `folder` is not downloaded again (nor resolved).
+
+    Unlike download_audio(), the stream is saved as served (e.g. .webm or .m4a) without converting it to mp3.
+
+    Usage:
+        async with AsyncDownloader("Laughter_raw") as downloader:
+            results = await downloader.download_many(ids)
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        max_in_flight: int = 8,
+        per_host_rate: float = None,
+        retries: int = 2,
+        retry_delay: float = 1.0,
+        timeout: float = 30.0,
+        resolve: Callable[[str], Tuple[str, dict, str]] = None,
+    ):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.max_in_flight = max_in_flight
+        self.per_host_rate = per_host_rate
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.resolve = resolve or youtube_resolver()
+        self.pool = ConnectionPool(timeout)
+        self._executor = ThreadPoolExecutor(max_in_flight)
+        self._semaphore = None
+        self._next_start: Dict[str, float] = {}
+        self._rate_lock = None
+
+    async def __aenter__(self) -> "AsyncDownloader":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+
+    async def download_many(self, ids: Iterable[str]) -> List[DownloadResult]:
+        """
+        Download every YTID of `ids` and return their results in the same order.
+        """
+        return list(await asyncio.gather(*(self.download(YTID) for YTID in ids)))
+
+    async def download(self, YTID: str) -> DownloadResult:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._rate_lock = asyncio.Lock()
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        path = self._existing(YTID)
+        if path is not None:
+            # Already downloaded: no need to resolve the video (a request to YouTube) to learn its extension.
+            return DownloadResult(YTID, path, True, 0, time.perf_counter() - start, 0, None)
+
+        error = None
+        for attempt in range(1, self.retries + 2):
+            # The slot is only held while working on the video, so that the backoff below lets other videos run.
+            async with self._semaphore:
+                try:
+                    url, headers, ext = await loop.run_in_executor(self._executor, self.resolve, YTID)
+                    path = os.path.join(self.folder, '%s.%s' % (YTID, ext))
+                    await self._wait_for_host(urlsplit(url).netloc)
+                    size = await loop.run_in_executor(self._executor, self._fetch, url, headers, path)
+                    return DownloadResult(YTID, path, True, size, time.perf_counter() - start, attempt, None)
+                except Exception as e:
+                    error = repr(e)
+            if attempt <= self.retries:
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+        return DownloadResult(YTID, path, False, 0, time.perf_counter() - start, self.retries + 1, error)
+
+    def _existing(self, YTID: str) -> str:
+        # <YTID>.<ext> with a single extension: YTIDs may contain dots, so "abc.def.mp3" is video "abc.def", not "abc".
+        # This also leaves out the <YTID>.<ext>.part files of interrupted transfers.
+        pattern = re.compile(re.escape(YTID) + r'\.[^.]+$')
+        for name in os.listdir(self.folder):
+            if pattern.match(name) and not name.endswith('.part'):
+                return os.path.join(self.folder, name)
+        return None
+
+    async def _wait_for_host(self, host: str) -> None:
+        if not self.per_host_rate:
+            return
+        async with self._rate_lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + 1 / self.per_host_rate
+        await asyncio.sleep(start - now)
+
+    def _fetch(self, url: str, headers: dict, path: str, redirects: int = 5) -> int:
+        parts = urlsplit(url)
+        target = parts.path + ('?' + parts.query if parts.query else '')
+        connection = self.pool.get(parts.scheme, parts.netloc)
+        try:
+            connection.request('GET', target or '/', headers=headers)
+            response = connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # The server may have closed an idle keep-alive connection: retry once on a new one.
+            connection.close()
+            connection.connect()
+            connection.request('GET', target or '/', headers=headers)
+            response = connection.getresponse()
+
+        location = None
+        size = 0
+        try:
+            if response.status in (301, 302, 303, 307, 308) and redirects > 0:
+                response.read()
+                location = urljoin(url, response.getheader('Location'))
+            elif response.status != 200:
+                response.read()
+                raise IOError('HTTP %d for %s' % (response.status, url))
+            else:
+                tmp_path = path + '.part'
+                with open(tmp_path, 'wb') as f:
+                    while True:
+                        chunk = response.read(64 * 1024)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        size += len(chunk)
+                os.replace(tmp_path, path)
+        except Exception:
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            self.pool.put(parts.scheme, parts.netloc, connection)
+
+        if location is not None:
+            return self._fetch(location, headers, path, redirects - 1)
+        return size
@@ -0,0 +1,235 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List
+
+
+class AudioStore:
+    """
+    Raw downloads and cut segments shared by every pipeline run, stored once per video under `root`.
+
+    Raw audio is keyed by YTID and cuts by (YTID, start, end), so a video tagged with several labels is downloaded
+    and cut once, and each label folder only gets a hard link to the stored cut (or a copy when linking is not
+    possible, e.g. across file systems).
+
+    An SQLite index next to the files records the size, SHA-256 and last use of every object. When `max_bytes` is set,
+    the least recently used objects are evicted once the store grows past it; files already linked into label folders
+    stay there. Objects still in use are pinned (see pin()) and never evicted: fetch(pin=True) keeps a raw file until
+    its cut is made, and cut(pin=True) keeps a cut until it is materialised.
+    """
+
+    def __init__(self, root: str = "audio_store", max_bytes: int = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._pins: Dict[str, int] = {}
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS objects ("
+                " key TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, sha256 TEXT NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+
+    def close(self) -> None:
+        self._db.close()
+
+    def raw_path(self, YTID: str) -> str:
+        return self._path("raw", YTID + ".mp3")
+
+    def cut_path(self, YTID: str, start: float, end: float) -> str:
+        return self._path("cut", "%s_%s_%s.mp3" % (YTID, start, end))
+
+    @staticmethod
+    def raw_key(YTID: str) -> str:
+        return "raw:" + YTID
+
+    @staticmethod
+    def cut_key(YTID: str, start: float, end: float) -> str:
+        return "cut:%s:%s:%s" % (YTID, start, end)
+
+    def pin(self, key: str) -> None:
+        """
+        Protect the object `key` from eviction until a matching unpin(). Pins are counted, so several users of the
+        same object can pin it independently.
+        """
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, key: str) -> None:
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+
+    def _path(self, kind: str, name: str) -> str:
+        # Spread the files over 256 sub-folders rather than one huge folder.
+        shard = hashlib.sha1(name.encode()).hexdigest()[:2]
+        return os.path.join(self.root, kind, shard, name)
+
+    def fetch(self, YTID: str, downloader: Callable[[str, str], None], pin: bool = False) -> str:
+        """
+        Return the path of the raw audio of `YTID`, calling downloader(YTID, path) if it is not in the store yet.
+
+        With `pin=True`, the raw file stays pinned after returning and the caller must unpin(raw_key(YTID)) once
+        done with it. It is unpinned again if the download fails.
+        """
+        path = self.raw_path(YTID)
+        key = self.raw_key(YTID)
+        # Pin before the lookup, so that the file cannot be evicted between the hit and the caller using it.
+        self.pin(key)
+        try:
+            with self._key_lock(key):
+                if not self._hit(key, path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    downloader(YTID, path)
+                    self._add(key, path)
+        except BaseException:
+            self.unpin(key)
+            raise
+        if not pin:
+            self.unpin(key)
+        return path
+
+    def cut(self, YTID: str, start: float, end: float, cutter: Callable[[str, str, float, float], None],
+            downloader: Callable[[str, str], None], pin: bool = False) -> str:
+        """
+        Return the path of the [start, end] segment of `YTID`, fetching and cutting the raw audio if needed.
+
+        The raw file is pinned while it is cut. With `pin=True`, the cut stays pinned after returning and the caller
+        must unpin(cut_key(YTID, start, end)) once it is materialised.
+        """
+        path = self.cut_path(YTID, start, end)
+        key = self.cut_key(YTID, start, end)
+        self.pin(key)
+        try:
+            with self._key_lock(key):
+                if not self._hit(key, path):
+                    raw_path = self.fetch(YTID, downloader, pin=True)
+                    try:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        # Cut to a temporary name (keeping the extension for ffmpeg) so that a failed cut leaves
+                        # nothing behind.
+                        tmp_path = path[:-len(".mp3")] + ".part.mp3"
+                        if os.path.exists(tmp_path):
+                            os.remove(tmp_path)
+                        cutter(raw_path, tmp_path, start, end)
+                        os.replace(tmp_path, path)
+                    finally:
+                        self.unpin(self.raw_key(YTID))
+                    self._add(key, path)
+        except BaseException:
+            self.unpin(key)
+            raise
+        if not pin:
+            self.unpin(key)
+        return path
+
+    def materialise(self, stored_path: str, dest: str) -> None:
+        """
+        Make `dest` a hard link to the stored file, or a copy of it if the link cannot be created.
+        """
+        link_or_copy(stored_path, dest)
+
+    def verify(self) -> List[str]:
+        """
+        Check every stored file against its recorded SHA-256, drop the ones that are missing or corrupted from the
+        store and return their keys.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT key, path, sha256 FROM objects").fetchall()
+
+        bad = [key for key, path, sha256 in rows if not os.path.exists(path) or _sha256(path) != sha256]
+        for key, path, _ in rows:
+            if key in bad:
+                self._remove(key, path)
+        return bad
+
+    def size(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _hit(self, key: str, path: str) -> bool:
+        # A hit only trusts the file if it still has its recorded size; verify() does the full hash check.
+        with self._lock:
+            row = self._db.execute("SELECT size FROM objects WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return False
+            if not os.path.exists(path) or os.path.getsize(path) != row[0]:
+                with self._db:
+                    self._db.execute("DELETE FROM objects WHERE key = ?", (key,))
+                return False
+            with self._db:
+                self._db.execute("UPDATE objects SET last_used = ? WHERE key = ?", (time.time(), key))
+            return True
+
+    def _add(self, key: str, path: str) -> None:
+        size = os.path.getsize(path)
+        sha256 = _sha256(path)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?)", (key, path, size, sha256, time.time())
+            )
+        self._evict(keep=key)
+
+    def _remove(self, key: str, path: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM objects WHERE key = ?", (key,))
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _evict(self, keep: str) -> None:
+        if self.max_bytes is None:
+            return
+        # Pins are checked and rows deleted under the same lock, so an object cannot be pinned once chosen for
+        # eviction. Pinned objects are skipped, even if that leaves the store over max_bytes for a while.
+        evicted = []
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self._db.execute("SELECT key, path, size FROM objects ORDER BY last_used").fetchall()
+            with self._db:
+                for key, path, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    if key == keep or key in self._pins:
+                        continue
+                    self._db.execute("DELETE FROM objects WHERE key = ?", (key,))
+                    evicted.append(path)
+                    total -= size
+
+        for path in evicted:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def link_or_copy(src: str, dest: str) -> None:
+    """
+    Make `dest` a hard link to `src`, or a copy of it if the link cannot be created. An existing `dest` is kept.
+    """
+    if os.path.exists(dest):
+        return
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
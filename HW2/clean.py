@@ -0,0 +1,59 @@
+import sys
+import time
+import pandas as pd
+from q1 import convert_ids_series
+
+
+def clean_segments(in_path: str, out_path: str, chunksize: int = 100_000, parquet_path: str = None) -> dict:
+    """
+    Stream `audio_segments.csv` into `audio_segments_clean.csv`, adding the `label_count` and `label_names` columns.
+
+    The input is read `chunksize` rows at a time and each chunk is appended to the output as soon as it is converted,
+    so memory use depends on `chunksize` and not on the size of the input (the full AudioSet unbalanced split is
+    about 2M rows). If `parquet_path` is given, the same rows are also written to a Parquet file (requires pyarrow).
+
+    Returns the number of rows written, the elapsed time and the throughput in rows/sec.
+    """
+    parquet_writer = None
+    if parquet_path is not None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Writing Parquet requires pyarrow (pip install pyarrow)")
+
+    start_time = time.perf_counter()
+    n_rows = 0
+
+    # The timestamps are read as floats in every chunk so that the output does not depend on where chunks start.
+    dtype = {" start_seconds": "float64", " end_seconds": "float64"}
+    reader = pd.read_csv(in_path, chunksize=chunksize, dtype=dtype)
+
+    try:
+        for i, chunk in enumerate(reader):
+            labels = chunk[" positive_labels"]
+            chunk["label_count"] = labels.str.count(",") + 1
+            chunk["label_names"] = convert_ids_series(labels)
+
+            chunk.to_csv(out_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+            if parquet_path is not None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(parquet_path, table.schema)
+                parquet_writer.write_table(table)
+
+            n_rows += len(chunk)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+    elapsed = time.perf_counter() - start_time
+    return {"rows": n_rows, "seconds": elapsed, "rows_per_sec": n_rows / elapsed if elapsed else float("inf")}
+
+
+if __name__ == "__main__":
+    in_path = sys.argv[1] if len(sys.argv) > 1 else "data/audio_segments.csv"
+    out_path = sys.argv[2] if len(sys.argv) > 2 else "data/audio_segments_clean.csv"
+    stats = clean_segments(in_path, out_path)
+    print(f"{stats['rows']} rows in {stats['seconds']:.2f}s ({stats['rows_per_sec']:.0f} rows/sec)")
@@ -0,0 +1,224 @@
+import os
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from typing import Dict, Iterable, List
+
+
+class LabelMatrix:
+    """
+    Multi-hot encoding of a column of separated labels as a SciPy CSR matrix of shape (rows, labels).
+
+    For example, with sep="|":
+    "Music|Speech"  ->  [1, 1, 0]
+    "Piano|Music"   ->  [1, 0, 1]
+    for labels ["Music", "Speech", "Piano"].
+
+    Labels are compared as exact tokens, so "Music" does not match "Music genre".
+    """
+
+    def __init__(self, matrix: sparse.csr_matrix, labels: List[str]):
+        self.matrix = matrix
+        self.labels = labels
+        self.label_to_col = {label: i for i, label in enumerate(labels)}
+        self._cooccurrence = None
+
+    @classmethod
+    def from_series(cls, labels: pd.Series, sep: str = "|", vocabulary: List[str] = None) -> "LabelMatrix":
+        """
+        Build the matrix from a Series of `sep` separated labels.
+
+        If `vocabulary` is given (e.g. `get_ontology().ids` for the `positive_labels` column) it fixes the columns
+        and their order, otherwise the columns are the labels in order of first appearance. Missing values (None or
+        NaN) are rows without any label.
+        """
+        label_to_col = {} if vocabulary is None else {label: i for i, label in enumerate(vocabulary)}
+
+        # Encode each distinct label string once, then select its row for every row of the Series.
+        codes, uniques = pd.factorize(labels)
+        indptr = [0]
+        indices = []
+        for u in uniques:
+            for label in u.split(sep):
+                if label not in label_to_col:
+                    if vocabulary is not None:
+                        raise KeyError(label)
+                    label_to_col[label] = len(label_to_col)
+                indices.append(label_to_col[label])
+            indptr.append(len(indices))
+        # pd.factorize codes missing values as -1: point them to an extra empty row instead of the last unique one.
+        indptr.append(len(indices))
+        codes = np.where(codes < 0, len(uniques), codes)
+
+        unique_matrix = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), indices, indptr),
+            shape=(len(uniques) + 1, len(label_to_col)),
+        )
+        # A label repeated within a row still only counts once.
+        unique_matrix.sum_duplicates()
+        unique_matrix.data[:] = 1
+
+        return cls(unique_matrix[codes], list(label_to_col))
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def counts(self) -> pd.Series:
+        """
+        Number of rows having each label.
+        """
+        return pd.Series(np.diag(self.cooccurrence()), index=self.labels)
+
+    def cooccurrence(self) -> np.ndarray:
+        """
+        Return the (labels, labels) matrix whose entry [i, j] is the number of rows having both label i and label j,
+        computed with a single sparse product.
+        """
+        if self._cooccurrence is None:
+            self._cooccurrence = (self.matrix.T @ self.matrix).toarray()
+        return self._cooccurrence
+
+    def conditional(self) -> pd.DataFrame:
+        """
+        Return the matrix of P(column label | row label), i.e. the proportion of rows having the row label that also
+        have the column label.
+        """
+        cooccurrence = self.cooccurrence()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            probabilities = cooccurrence / np.diag(cooccurrence)[:, None]
+
+        return pd.DataFrame(probabilities, index=self.labels, columns=self.labels)
+
+    def correlation(self, label_1: str, label_2: str) -> float:
+        """
+        Proportion of rows with label_1 that also have label_2.
+
+        Read from the co-occurrence matrix if it was already computed, otherwise from the two label columns only.
+        """
+        i = self.label_to_col.get(label_1)
+        j = self.label_to_col.get(label_2)
+        if self._cooccurrence is not None:
+            count_1 = 0 if i is None else self._cooccurrence[i, i]
+            count_both = 0 if i is None or j is None else self._cooccurrence[i, j]
+        else:
+            column_1 = None if i is None else self.matrix[:, i]
+            count_1 = 0 if column_1 is None else column_1.nnz
+            count_both = 0 if column_1 is None or j is None else column_1.multiply(self.matrix[:, j]).nnz
+
+        if count_1 == 0:
+            raise ZeroDivisionError("No row has the label %r" % label_1)
+        return count_both / count_1
+
+
+class LabelIndex:
+    """
+    Inverted index from each label to the sorted array of row numbers having it.
+
+    Queries combine the row arrays of their labels (intersection for AND, union for OR, difference for NOT) instead
+    of scanning every label string of the column.
+    """
+
+    def __init__(self, labels: List[str], indptr: np.ndarray, rows: np.ndarray, n_rows: int):
+        self.labels = labels
+        self.indptr = indptr
+        self.rows_by_label = rows
+        self.n_rows = n_rows
+        self.label_to_pos = {label: i for i, label in enumerate(labels)}
+
+    @classmethod
+    def from_series(cls, labels: pd.Series, sep: str = "|") -> "LabelIndex":
+        # The CSC form of the multi-hot matrix already stores, for each label, the sorted rows having it.
+        label_matrix = LabelMatrix.from_series(labels, sep=sep)
+        csc = label_matrix.matrix.tocsc()
+        csc.sort_indices()
+
+        return cls(label_matrix.labels, csc.indptr.astype(np.int64), csc.indices.astype(np.int64), len(label_matrix))
+
+    @classmethod
+    def for_csv(cls, csv_path: str, column: str = "label_names", sep: str = "|") -> "LabelIndex":
+        """
+        Return the index of `column` in the csv at `csv_path`.
+
+        The index is kept in memory for the process and persisted next to the csv (`<csv_path>.<column>.idx.npz`),
+        and is only rebuilt when the size or modification time of the csv changes.
+        """
+        stat = os.stat(csv_path)
+        key = (csv_path, column, sep)
+        version = (stat.st_size, stat.st_mtime_ns)
+
+        cached = _indexes.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        index_path = "%s.%s.idx.npz" % (csv_path, column.strip().replace(" ", "_"))
+        index = cls._read(index_path, version, sep)
+        if index is None:
+            index = cls.from_series(pd.read_csv(csv_path, usecols=[column])[column], sep=sep)
+            index._write(index_path, version, sep)
+
+        _indexes[key] = (version, index)
+        return index
+
+    @classmethod
+    def _read(cls, index_path: str, version: tuple, sep: str):
+        try:
+            with np.load(index_path) as data:
+                if tuple(data["version"]) != version or str(data["sep"]) != sep:
+                    return None
+                return cls(data["labels"].tolist(), data["indptr"], data["rows"], int(data["n_rows"]))
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _write(self, index_path: str, version: tuple, sep: str) -> None:
+        tmp_path = "%s.%d.tmp.npz" % (index_path[:-len(".npz")], os.getpid())
+        try:
+            np.savez(
+                tmp_path,
+                version=np.array(version, dtype=np.int64),
+                sep=np.array(sep),
+                labels=np.array(self.labels, dtype=str),
+                indptr=self.indptr,
+                rows=self.rows_by_label,
+                n_rows=np.array(self.n_rows),
+            )
+            os.replace(tmp_path, index_path)
+        except OSError:
+            pass
+
+    def rows(self, label: str) -> np.ndarray:
+        """
+        Sorted row numbers having `label` (empty if no row has it).
+        """
+        pos = self.label_to_pos.get(label)
+        if pos is None:
+            return np.empty(0, dtype=np.int64)
+        return self.rows_by_label[self.indptr[pos]:self.indptr[pos + 1]]
+
+    def query(
+        self, all_of: Iterable[str] = (), any_of: Iterable[str] = None, none_of: Iterable[str] = ()
+    ) -> np.ndarray:
+        """
+        Sorted row numbers having every label of `all_of`, at least one label of `any_of` (unless it is None) and no
+        label of `none_of`. An empty `any_of` matches no row, as no row has at least one of its labels.
+
+        For example, query(all_of=["Music"], none_of=["Speech"]) are the rows with music but no speech.
+        """
+        result = None
+        for label in all_of:
+            rows = self.rows(label)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+
+        if any_of is not None:
+            rows = np.unique(np.concatenate([self.rows(label) for label in any_of] + [np.empty(0, dtype=np.int64)]))
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+
+        if result is None:
+            result = np.arange(self.n_rows, dtype=np.int64)
+
+        for label in none_of:
+            result = np.setdiff1d(result, self.rows(label), assume_unique=True)
+
+        return result
+
+
+_indexes: Dict[tuple, tuple] = {}
@@ -0,0 +1,168 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+
+PENDING = "pending"
+DOWNLOADED = "downloaded"
+CUT = "cut"
+FAILED = "failed"
+
+
+class Manifest:
+    """
+    Persistent record of the state of every video of a pipeline run for `label`, stored in an SQLite file.
+
+    Several labels can share the same file: jobs are keyed by (label, YTID) and every method only sees the jobs of
+    its own label, so a video with two labels is tracked (and cut) once for each of them.
+
+    Each YTID goes pending -> downloaded -> cut, or to failed with the reason of its last failure. A failed video is
+    retried on a later run after an exponential backoff (`base_delay` * 2 ** (attempts - 1) seconds, at most
+    `max_delay`) and given up after `max_attempts` attempts.
+
+    The connection is shared by the pipeline threads, so every access goes through a lock.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        label: str = "",
+        max_attempts: int = 5,
+        base_delay: float = 60.0,
+        max_delay: float = 24 * 3600.0,
+    ):
+        self.path = path
+        self.label = label
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " label TEXT NOT NULL, ytid TEXT NOT NULL, start REAL, end REAL, raw_file TEXT, cut_file TEXT,"
+                " state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, reason TEXT,"
+                " next_attempt REAL NOT NULL DEFAULT 0, updated REAL, PRIMARY KEY (label, ytid))"
+            )
+
+    def close(self) -> None:
+        self._db.close()
+
+    def source(self) -> str:
+        """
+        Signature of the csv the jobs were created from (see set_source()), or None for a new manifest.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", ("source:" + self.label,)).fetchone()
+        return None if row is None else row[0]
+
+    def set_source(self, source: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", ("source:" + self.label, source))
+
+    def labels(self) -> List[str]:
+        """
+        Every label with jobs in the file.
+        """
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT DISTINCT label FROM jobs ORDER BY label")]
+
+    def add(self, jobs: Iterable[Tuple[str, float, float, str, str]]) -> None:
+        """
+        Register (YTID, start, end, raw_file, cut_file) jobs as pending. Jobs already in the manifest keep their state.
+        """
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO jobs (label, ytid, start, end, raw_file, cut_file, state, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(self.label, *job, PENDING, time.time()) for job in jobs],
+            )
+
+    def jobs(self) -> List[Tuple[str, float, float, str, str]]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT ytid, start, end, raw_file, cut_file FROM jobs WHERE label = ? ORDER BY rowid", (self.label,)
+            ).fetchall()
+
+    def states(self) -> Dict[str, Tuple[str, int, float]]:
+        """
+        Map every YTID to its (state, attempts, next_attempt), read in a single query.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT ytid, state, attempts, next_attempt FROM jobs WHERE label = ?", (self.label,)
+            ).fetchall()
+        return {ytid: (state, attempts, next_attempt) for ytid, state, attempts, next_attempt in rows}
+
+    def runnable(self, jobs: Iterable[tuple], now: float = None) -> list:
+        """
+        Return the jobs (whose first field is the YTID) that still have work to do: not cut yet, and if they failed,
+        with attempts left and their backoff delay elapsed.
+        """
+        now = time.time() if now is None else now
+        states = self.states()
+        result = []
+        for job in jobs:
+            state, attempts, next_attempt = states.get(job[0], (PENDING, 0, 0.0))
+            if state == CUT:
+                continue
+            if state == FAILED and (attempts >= self.max_attempts or next_attempt > now):
+                continue
+            result.append(job)
+        return result
+
+    def mark(self, ytid: str, state: str, reason: str = None) -> None:
+        """
+        Record the new state of `ytid`. Marking it as failed counts an attempt and schedules the next one.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            if state == FAILED:
+                attempts = self._db.execute(
+                    "SELECT attempts FROM jobs WHERE label = ? AND ytid = ?", (self.label, ytid)
+                ).fetchone()[0] + 1
+                delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+                self._db.execute(
+                    "UPDATE jobs SET state = ?, attempts = ?, reason = ?, next_attempt = ?, updated = ?"
+                    " WHERE label = ? AND ytid = ?",
+                    (state, attempts, reason, now + delay, now, self.label, ytid),
+                )
+            else:
+                self._db.execute(
+                    "UPDATE jobs SET state = ?, reason = NULL, updated = ? WHERE label = ? AND ytid = ?",
+                    (state, now, self.label, ytid),
+                )
+
+    def summary(self) -> Dict[str, int]:
+        """
+        Number of videos in each state, plus those failed for good (out of attempts) under "given_up".
+        """
+        with self._lock:
+            counts = dict(self._db.execute(
+                "SELECT state, COUNT(*) FROM jobs WHERE label = ? GROUP BY state", (self.label,)
+            ).fetchall())
+            given_up = self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE label = ? AND state = ? AND attempts >= ?",
+                (self.label, FAILED, self.max_attempts),
+            ).fetchone()[0]
+
+        summary = {state: counts.get(state, 0) for state in (PENDING, DOWNLOADED, CUT, FAILED)}
+        summary["given_up"] = given_up
+        return summary
+
+
+def csv_signature(csv_path: str) -> str:
+    stat = os.stat(csv_path)
+    return "%s:%d:%d" % (os.path.abspath(csv_path), stat.st_size, stat.st_mtime_ns)
+
+
+if __name__ == "__main__":
+    for label in Manifest(sys.argv[1]).labels():
+        print(label)
+        for state, count in Manifest(sys.argv[1], label).summary().items():
+            print(f"    {state:<10} {count}")
@@ -0,0 +1,190 @@
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Sequence
+
+
+# Upper bounds (in seconds) of the latency histogram buckets, from ffmpeg cuts of a few ms to downloads of minutes.
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, float('inf'))
+
+
+class Stage:
+    """
+    Context manager timing one item of a stage (see Metrics.stage()). `bytes` and `retries` can be set inside the
+    block; an exception leaving the block is recorded with its class name and raised again.
+    """
+
+    __slots__ = ('metrics', 'name', 'item', 'bytes', 'retries', 'start')
+
+    def __init__(self, metrics: 'Metrics', name: str, item: str):
+        self.metrics = metrics
+        self.name = name
+        self.item = item
+        self.bytes = 0
+        self.retries = 0
+
+    def __enter__(self) -> 'Stage':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.metrics.record(
+            self.name, time.perf_counter() - self.start, self.item, self.bytes, self.retries,
+            None if exc_type is None else exc_type.__name__,
+        )
+
+
+class _NullStage:
+    """
+    Stand-in for Stage when metrics are disabled: entering and leaving it does nothing.
+    """
+
+    __slots__ = ('bytes', 'retries')
+
+    def __enter__(self) -> '_NullStage':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Metrics:
+    """
+    Per-item measurements of the audio pipeline, grouped by stage (e.g. "download.transfer", "cut_audio").
+
+    Every item records its latency, bytes, retries and error class (None on success). For each stage, the totals and
+    a latency histogram over BUCKETS are kept up to date, and report() / write() export them as JSON and in the
+    Prometheus text format. Recording is thread-safe, since the pipeline records from its worker threads.
+    """
+
+    def __init__(self, buckets: Sequence[float] = BUCKETS):
+        self.buckets = tuple(buckets)
+        self.items: List[dict] = []
+        self.stages: Dict[str, dict] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def stage(self, name: str, item: str = None) -> Stage:
+        return Stage(self, name, item)
+
+    def record(self, stage: str, seconds: float, item: str = None, bytes: int = 0, retries: int = 0,
+               error: str = None) -> None:
+        with self._lock:
+            self.items.append({
+                'stage': stage, 'item': item, 'seconds': seconds, 'bytes': bytes, 'retries': retries, 'error': error,
+            })
+            totals = self.stages.get(stage)
+            if totals is None:
+                totals = self.stages[stage] = {
+                    'count': 0, 'seconds': 0.0, 'bytes': 0, 'retries': 0, 'errors': {},
+                    'histogram': [0] * len(self.buckets),
+                }
+            totals['count'] += 1
+            totals['seconds'] += seconds
+            totals['bytes'] += bytes
+            totals['retries'] += retries
+            if error is not None:
+                totals['errors'][error] = totals['errors'].get(error, 0) + 1
+            totals['histogram'][bisect.bisect_left(self.buckets, seconds)] += 1
+
+    def report(self) -> dict:
+        """
+        The run report: per-stage totals, latency histograms and percentiles, and the list of all items.
+        """
+        with self._lock:
+            items = list(self.items)
+            stages = {name: dict(totals, errors=dict(totals['errors']), histogram=list(totals['histogram']))
+                      for name, totals in self.stages.items()}
+
+        for name, totals in stages.items():
+            latencies = sorted(item['seconds'] for item in items if item['stage'] == name)
+            totals['buckets'] = [str(bound) for bound in self.buckets]
+            for q in (50, 90, 99):
+                totals['p%d' % q] = latencies[min(len(latencies) - 1, len(latencies) * q // 100)]
+
+        return {'started': self.started, 'finished': time.time(), 'stages': stages, 'items': items}
+
+    def prometheus(self, prefix: str = 'audio_pipeline') -> str:
+        """
+        The per-stage metrics in the Prometheus text exposition format (latency histogram, bytes, retries and
+        errors by class), e.g. for the textfile collector of node_exporter.
+        """
+        with self._lock:
+            stages = sorted((name, dict(totals, errors=dict(totals['errors']), histogram=list(totals['histogram'])))
+                            for name, totals in self.stages.items())
+
+        lines = [
+            '# HELP %s_stage_seconds Latency of each item of a pipeline stage.' % prefix,
+            '# TYPE %s_stage_seconds histogram' % prefix,
+        ]
+        for name, totals in stages:
+            cumulative = 0
+            for bound, count in zip(self.buckets, totals['histogram']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('%s_stage_seconds_bucket{stage="%s",le="%s"} %d' % (prefix, name, le, cumulative))
+            lines.append('%s_stage_seconds_sum{stage="%s"} %r' % (prefix, name, totals['seconds']))
+            lines.append('%s_stage_seconds_count{stage="%s"} %d' % (prefix, name, totals['count']))
+
+        for metric, key, help_text in (
+            ('bytes', 'bytes', 'Bytes written by a pipeline stage.'),
+            ('retries', 'retries', 'Retries within a pipeline stage.'),
+        ):
+            lines.append('# HELP %s_stage_%s_total %s' % (prefix, metric, help_text))
+            lines.append('# TYPE %s_stage_%s_total counter' % (prefix, metric))
+            for name, totals in stages:
+                lines.append('%s_stage_%s_total{stage="%s"} %d' % (prefix, metric, name, totals[key]))
+
+        lines.append('# HELP %s_stage_errors_total Failed items of a pipeline stage, by error class.' % prefix)
+        lines.append('# TYPE %s_stage_errors_total counter' % prefix)
+        for name, totals in stages:
+            for error, count in sorted(totals['errors'].items()):
+                lines.append('%s_stage_errors_total{stage="%s",error="%s"} %d' % (prefix, name, error, count))
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        """
+        Write the run report to `path` (JSON) and the Prometheus metrics next to it, with a .prom extension.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        with open(os.path.splitext(path)[0] + '.prom', 'w') as f:
+            f.write(self.prometheus())
+
+
+_metrics: Metrics = None
+
+
+def enable(metrics: Metrics = None) -> Metrics:
+    """
+    Start recording the instrumented functions (download_audio, cut_audio, run_jobs) into `metrics`, or into a new
+    Metrics, which is returned.
+    """
+    global _metrics
+    _metrics = metrics if metrics is not None else Metrics()
+    return _metrics
+
+
+def disable() -> None:
+    global _metrics
+    _metrics = None
+
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+
+def stage(name: str, item: str = None):
+    """
+    Time one item of stage `name` into the enabled Metrics. When metrics are disabled, this returns a shared no-op
+    context manager, so instrumented code only pays for a global lookup and a function call.
+    """
+    if _metrics is None:
+        return _NULL_STAGE
+    return Stage(_metrics, name, item)
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import pickle
+from typing import Dict, FrozenSet, List, Set
+
+
+ONTOLOGY_PATH = "data/ontology.json"
+
+# Bump whenever the fields stored in the compiled cache change.
+CACHE_VERSION = 3
+
+
+class Ontology:
+    """
+    In-memory view of the AudioSet ontology (https://github.com/audioset/ontology).
+
+    The file is parsed once and indexed into dictionaries so that converting between label IDs and label names is
+    a single O(1) lookup instead of a linear scan over the whole file.
+
+    The ontology is a DAG (a label can have several parents, e.g. "Growling" is under "Dog", "Cat" and
+    "Canidae, dogs, wolves"), so the transitive closure is precomputed as one set of descendant IDs per node rather
+    than as intervals of a tree traversal. The closure is computed from the JSON file and stored in the compiled
+    cache with the rest, so that a warm load does not walk the hierarchy again.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        names: List[str],
+        child_ids: List[List[str]],
+        descendant_ids: Dict[str, FrozenSet[str]],
+        mtime: float = None,
+    ):
+        self.mtime = mtime
+        self.ids = ids
+        self.names = names
+        self.child_ids = child_ids
+        self.id_to_name: Dict[str, str] = dict(zip(ids, names))
+        self.name_to_id: Dict[str, str] = dict(zip(names, ids))
+        self.children: Dict[str, List[str]] = dict(zip(ids, child_ids))
+        self.descendant_ids = descendant_ids
+
+    @classmethod
+    def from_json(cls, path: str = ONTOLOGY_PATH) -> "Ontology":
+        mtime = os.path.getmtime(path)
+        with open(path) as f:
+            nodes = json.load(f)
+        ids = [node["id"] for node in nodes]
+        child_ids = [node["child_ids"] for node in nodes]
+        return cls(
+            ids,
+            [node["name"] for node in nodes],
+            child_ids,
+            _transitive_closure(dict(zip(ids, child_ids))),
+            mtime,
+        )
+
+    @classmethod
+    def load(cls, path: str = ONTOLOGY_PATH) -> "Ontology":
+        """
+        Load the ontology from its compiled cache (`<path>.cache`), rebuilding the cache from the JSON file when it
+        is missing, was written by another CACHE_VERSION or the JSON content has changed.
+
+        The cache is only validated by hashing the JSON file when its size or mtime differ from the ones recorded in
+        the cache, so a warm start is a stat and a small unpickle.
+        """
+        cache_path = path + ".cache"
+        stat = os.stat(path)
+        cached = _read_cache(cache_path)
+
+        if cached is not None and cached["version"] == CACHE_VERSION:
+            if (cached["size"], cached["mtime"]) == (stat.st_size, stat.st_mtime):
+                return cls(
+                    cached["ids"], cached["names"], cached["child_ids"], cached["descendant_ids"], stat.st_mtime
+                )
+            if cached["sha1"] == _sha1(path):
+                cached.update(size=stat.st_size, mtime=stat.st_mtime)
+                _write_cache(cache_path, cached)
+                return cls(
+                    cached["ids"], cached["names"], cached["child_ids"], cached["descendant_ids"], stat.st_mtime
+                )
+
+        ontology = cls.from_json(path)
+        _write_cache(cache_path, {
+            "version": CACHE_VERSION,
+            "sha1": _sha1(path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "ids": ontology.ids,
+            "names": ontology.names,
+            "child_ids": ontology.child_ids,
+            "descendant_ids": ontology.descendant_ids,
+        })
+        return ontology
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def descendants(self, name: str) -> Set[str]:
+        """
+        Return the names of `name` and of every label below it in the hierarchy.
+
+        For example, "Human sounds" -> {"Human sounds", "Human voice", "Speech", "Laughter", ...}
+
+        A name that is not in the ontology has no descendants (not even itself), like a label that no row has.
+        """
+        label_id = self.name_to_id.get(name)
+        if label_id is None:
+            return set()
+        return {self.id_to_name[i] for i in self.descendant_ids[label_id]}
+
+    def ancestors(self, name: str) -> Set[str]:
+        """
+        Return the names of `name` and of every label above it in the hierarchy, or the empty set if `name` is not
+        in the ontology.
+        """
+        label_id = self.name_to_id.get(name)
+        if label_id is None:
+            return set()
+        return {self.id_to_name[i] for i, below in self.descendant_ids.items() if label_id in below}
+
+
+def _transitive_closure(children: Dict[str, List[str]]) -> Dict[str, FrozenSet[str]]:
+    closure: Dict[str, FrozenSet[str]] = {}
+
+    def visit(node: str) -> FrozenSet[str]:
+        if node not in closure:
+            below = {node}
+            for child in children.get(node, []):
+                below |= visit(child)
+            closure[node] = frozenset(below)
+        return closure[node]
+
+    for node in children:
+        visit(node)
+    return closure
+
+
+def _sha1(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _read_cache(cache_path: str):
+    try:
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def _write_cache(cache_path: str, cached: dict) -> None:
+    # Write to a temporary file first so that a concurrent reader never sees a partial cache. A read-only data
+    # folder simply means running without a cache.
+    tmp_path = "%s.%d.tmp" % (cache_path, os.getpid())
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+_ontologies: Dict[str, Ontology] = {}
+
+
+def get_ontology(path: str = ONTOLOGY_PATH) -> Ontology:
+    """
+    Return the process-wide Ontology for `path`, loading it on first use.
+
+    The file's modification time is checked on every call so that edits to the ontology are picked up without
+    restarting the process.
+    """
+    mtime = os.path.getmtime(path)
+    ontology = _ontologies.get(path)
+    if ontology is None or ontology.mtime != mtime:
+        ontology = Ontology.load(path)
+        _ontologies[path] = ontology
+    return ontology
@@ -1,5 +1,10 @@
-import json
+import os
+import re
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from labels import LabelIndex
+from ontology import get_ontology
 
 
 def count_labels(labels: str) -> int:
@@ -22,13 +27,10 @@ def convert_id(ID: str) -> str:
 
     While reading the file each time and looping through the elements to find a match works well enough for our
     purposes, think of ways this process could be sped up if say this function needed to be run 100000 times.
+
+    The ontology is loaded once per process by `get_ontology()` and indexed by ID, so each call is a dictionary lookup.
     """
-    with open("data/ontology.json") as f:
-        data = json.load(f)
-        for i in data:
-            if i["id"] == ID:
-                return i["name"]
-    return None
+    return get_ontology().id_to_name.get(ID)
 
 
 def convert_ids(labels: str) -> str:
@@ -39,15 +41,62 @@ def convert_ids(labels: str) -> str:
     For example:
     "/m/04rlf,/m/06_fw,/m/09x0r" -> "Music|Skateboard|Speech"
     """
-    labels = labels.split(",")
-    string = [convert_id(i) for i in labels]
+    return _join_names(labels, get_ontology().id_to_name)
 
-    result = "|".join(string)
 
-    return result
+def _join_names(labels: str, id_to_name: dict) -> str:
+    return "|".join([id_to_name.get(i) for i in labels.split(",")])
+
+
+def convert_ids_series(labels: pd.Series) -> pd.Series:
+    """
+    Vectorized version of convert_ids() over a whole `positive_labels` column.
+
+    Many rows share the exact same label string, so each distinct string is converted once and the results are
+    broadcast back to the rows with `pd.factorize`. Missing values stay missing.
+    """
+    names = _convert_factorized(labels, get_ontology().id_to_name)
+
+    return pd.Series(names, index=labels.index, name=labels.name)
+
+
+def _convert_factorized(labels: np.ndarray, id_to_name: dict) -> np.ndarray:
+    codes, uniques = pd.factorize(labels)
+    # pd.factorize codes missing values as -1, which picks the NaN appended after the distinct strings.
+    names = np.array([_join_names(u, id_to_name) for u in uniques] + [np.nan], dtype=object)
+    return names[codes]
+
+
+_worker_id_to_name = None
+
+
+def _init_worker(id_to_name: dict) -> None:
+    global _worker_id_to_name
+    _worker_id_to_name = id_to_name
 
 
-def contains_label(labels: pd.Series, label: str) -> pd.Series:
+def _convert_shard(shard: np.ndarray) -> np.ndarray:
+    return _convert_factorized(shard, _worker_id_to_name)
+
+
+def convert_ids_parallel(labels: pd.Series, workers: int = None, shards_per_worker: int = 4) -> pd.Series:
+    """
+    Same result as convert_ids_series(), with the column split in shards converted by a pool of `workers` processes
+    (all the CPUs by default).
+
+    The id -> name mapping is sent once to each worker through the pool initializer rather than with every shard, and
+    the shards are reassembled in their original order.
+    """
+    workers = workers or os.cpu_count()
+    shards = np.array_split(labels.to_numpy(dtype=object), workers * shards_per_worker)
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(get_ontology().id_to_name,)) as executor:
+        names = np.concatenate(list(executor.map(_convert_shard, shards)))
+
+    return pd.Series(names, index=labels.index, name=labels.name)
+
+
+def contains_label(labels: pd.Series, label: str, include_descendants: bool = False) -> pd.Series:
     """
     Create a function that takes a Series of strings where each string is formatted as above
     (i.e. "|" separated label names like "Music|Skateboard|Speech") and returns a Series with just
@@ -61,14 +110,29 @@ def contains_label(labels: pd.Series, label: str) -> pd.Series:
     the function should just return
     "Music|Skateboard|Speech"
     "Music|Piano"
-    """
 
-    result = labels[labels.str.contains(label)]
+    Labels are compared as exact names ("Music" does not match "Music genre"). With `include_descendants=True`, rows
+    with any label below `label` in the ontology also match (e.g. "Human sounds" matches "Voice|Speech").
+    """
+    if include_descendants:
+        # Many labels at once: one inverted index answers the whole query. A label outside the ontology has no
+        # descendants and is matched on its own, as without include_descendants.
+        descendants = get_ontology().descendants(label) or {label}
+        rows = LabelIndex.from_series(labels).query(any_of=descendants)
+        return labels.iloc[rows]
 
+    result = labels[_has_label(labels, label)]
 
     return result
 
 
+def _has_label(labels: pd.Series, label: str) -> pd.Series:
+    # A single pass over the strings, matching `label` only between separators (or the ends of the string) so that it
+    # is an exact token. Missing values have no label.
+    pattern = re.compile(r"(?:^|\|)" + re.escape(label) + r"(?:\||$)")
+    return labels.str.contains(pattern, na=False).astype(bool)
+
+
 def get_correlation(labels: pd.Series, label_1: str, label_2: str) -> float:
     """
     Create a function that, given a Series as described above, returns the proportion of rows
@@ -76,11 +140,15 @@ def get_correlation(labels: pd.Series, label_1: str, label_2: str) -> float:
 
     For example, suppose the Series has 1000 values, of which 120 have label_1. If 30 of the 120
     have label_2, your function should return 0.25.
+
+    Labels are compared as exact names ("Music" does not match "Music genre"), with one pass over the strings for
+    label_1 and one over the matching rows for label_2. Build a labels.LabelMatrix to answer many pairs on the same Series.
     """
-    label_1_series = contains_label(labels, label_1)
-    label_2_series = contains_label(label_1_series, label_2)
+    label_1_series = labels[_has_label(labels, label_1)]
+    if len(label_1_series) == 0:
+        raise ZeroDivisionError("No row has the label %r" % label_1)
 
-    return len(label_2_series) / len(label_1_series)
+    return _has_label(label_1_series, label_2).sum() / len(label_1_series)
 
 
 if __name__ == "__main__":
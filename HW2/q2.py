@@ -4,8 +4,13 @@ import pandas as pd
 import numpy as np
 import csv
 import threading
+import shutil
+import sys
+import time
 from tqdm import tqdm
-from os.path import exists
+from metrics import Metrics, get_metrics, stage
+from os.path import basename, exists, getsize, join, splitext
+from typing import Callable, List, NamedTuple
 
 
 def download_audio(YTID: str, path: str) -> None:
@@ -30,14 +35,84 @@ def download_audio(YTID: str, path: str) -> None:
             'key': 'FFmpegExtractAudio',
             'preferredcodec': 'mp3',
         }],
-        'outtmpl': path.strip('.mp3')
+        # yt-dlp adds the extension itself. (str.strip('.mp3') would also eat IDs ending in '.', 'm', 'p' or '3'.)
+        'outtmpl': path[:-len('.mp3')] if path.endswith('.mp3') else path
     }
 
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        error_code = ydl.download(URLS)
-        if error_code:
-            raise Exception('Audio failed to download')
+    metrics = get_metrics()
+    probe = None
+    if metrics is not None:
+        probe = _DownloadProbe(metrics, YTID)
+        ydl_opts.update(probe.options())
+
+    with stage('download_audio', YTID) as timer:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            error_code = ydl.download(URLS)
+            if error_code:
+                raise Exception('Audio failed to download')
+        if probe is not None:
+            timer.bytes = getsize(path) if exists(path) else 0
+            timer.retries = probe.retries
+
+
+class _DownloadProbe:
+    """
+    yt-dlp hooks and logger splitting an instrumented download_audio() into stages: "download.extract" (until the
+    transfer starts), "download.transfer" (the bytes received) and "download.postprocess" (the conversion to mp3).
+    The logger prints like yt-dlp does and counts the retries it reports.
+    """
+
+    def __init__(self, metrics: Metrics, YTID: str):
+        self.metrics = metrics
+        self.YTID = YTID
+        self.retries = 0
+        self.mark = time.perf_counter()
+        self.transfer_start = None
+        self.postprocess_start = None
+
+    def options(self) -> dict:
+        return {
+            'progress_hooks': [self.progress_hook],
+            'postprocessor_hooks': [self.postprocessor_hook],
+            'logger': self,
+        }
+
+    def progress_hook(self, d: dict) -> None:
+        if self.transfer_start is None:
+            self.transfer_start = time.perf_counter()
+            self.metrics.record('download.extract', self.transfer_start - self.mark, self.YTID)
+        if d['status'] in ('finished', 'error'):
+            self.metrics.record(
+                'download.transfer', time.perf_counter() - self.transfer_start, self.YTID,
+                d.get('downloaded_bytes') or d.get('total_bytes') or 0,
+                error='TransferError' if d['status'] == 'error' else None,
+            )
+            self.transfer_start = None
+            self.mark = time.perf_counter()
+
+    def postprocessor_hook(self, d: dict) -> None:
+        if d['status'] == 'started':
+            self.postprocess_start = time.perf_counter()
+        elif d['status'] == 'finished' and self.postprocess_start is not None:
+            self.metrics.record('download.postprocess', time.perf_counter() - self.postprocess_start, self.YTID)
+            self.postprocess_start = None
+
+    def debug(self, msg: str) -> None:
+        # yt-dlp sends its regular output to debug() when a logger is set, and the verbose output prefixed by [debug].
+        if not msg.startswith('[debug] '):
+            print(msg)
+
+    def info(self, msg: str) -> None:
+        print(msg)
+
+    def warning(self, msg: str) -> None:
+        if 'Retrying' in msg:
+            self.retries += 1
+        print(msg, file=sys.stderr)
+
+    def error(self, msg: str) -> None:
+        print(msg, file=sys.stderr)
 
 
 
@@ -56,5 +131,125 @@ def cut_audio(in_path: str, out_path: str, start: float, end: float) -> None:
       start: Indicates the start of the sequence (in seconds)
       end: Indicates the end of the sequence (in seconds)
     """
-    ffmpeg.input(in_path, ss=start, to=end).output(out_path).run()
+    # The item is the YTID, as for download_audio(): the raw audio is always saved as <YTID>.mp3, whereas the output
+    # may be a temporary or store path.
+    with stage('cut_audio', splitext(basename(in_path))[0]) as timer:
+        ffmpeg.input(in_path, ss=start, to=end).output(out_path).run()
+        if get_metrics() is not None:
+            timer.bytes = getsize(out_path)
+
+
+class CutJob(NamedTuple):
+    in_path: str
+    out_path: str
+    start: float
+    end: float
+
+
+# Containers whose audio codecs have no dependency between frames, so that a segment can be copied without decoding it.
+COPYABLE_EXTENSIONS = {'.mp3', '.m4a', '.aac', '.opus', '.ogg', '.flac', '.wav'}
+
+
+def cut_audio_batch(jobs: List[CutJob], copy: bool = True) -> List[dict]:
+    """
+    Cut many segments with one ffmpeg process per input file instead of one per segment: every segment taken from the
+    same input is an output of the same ffmpeg invocation, so the input is opened and read once.
+
+    When `copy` is True and an input and all of its outputs share a container from COPYABLE_EXTENSIONS, the segments
+    are stream copied (no decoding or encoding). If that fails, or the formats differ, the segments are re-encoded.
+    An input that fails to re-encode is retried one segment at a time so that one bad segment only fails itself.
+
+    Returns one report per job, in the order of `jobs`, with the mode used ("copy" or "encode"), the wall time of the
+    ffmpeg invocation that produced it, the number of segments of that invocation, and the error if any.
+    """
+    by_input = {}
+    for i, job in enumerate(jobs):
+        by_input.setdefault(job.in_path, []).append(i)
+
+    reports = [None] * len(jobs)
+    for in_path, indexes in by_input.items():
+        group = [jobs[i] for i in indexes]
+        extension = splitext(in_path)[1].lower()
+        can_copy = copy and extension in COPYABLE_EXTENSIONS and all(
+            splitext(job.out_path)[1].lower() == extension for job in group
+        )
+
+        results = None
+        if can_copy:
+            results = _run_cuts(group, 'copy')
+            if results[0]['error'] is not None:
+                results = None
+        if results is None:
+            results = _run_cuts(group, 'encode')
+            if results[0]['error'] is not None and len(group) > 1:
+                results = [_run_cuts([job], 'encode')[0] for job in group]
+
+        for i, result in zip(indexes, results):
+            reports[i] = dict(result, in_path=jobs[i].in_path, out_path=jobs[i].out_path)
+
+    return reports
+
+
+def _run_cuts(group: List[CutJob], mode: str) -> List[dict]:
+    stream = ffmpeg.input(group[0].in_path)
+    options = {'acodec': 'copy'} if mode == 'copy' else {}
+    outputs = [stream.output(job.out_path, ss=job.start, to=job.end, vn=None, **options) for job in group]
+
+    start = time.perf_counter()
+    try:
+        ffmpeg.merge_outputs(*outputs).run(quiet=True, overwrite_output=True)
+        error = None
+    except ffmpeg.Error as e:
+        error = e.stderr.decode(errors='replace').strip().splitlines()[-1] if e.stderr else str(e)
+    elapsed = time.perf_counter() - start
+
+    return [{'mode': mode, 'seconds': elapsed, 'batch_size': len(group), 'error': error} for _ in group]
+
+
+def stream_url(YTID: str) -> tuple:
+    """
+    Resolve the direct URL of the best audio stream of a Youtube video without downloading it.
+    Returns the URL and the HTTP headers yt-dlp expects to be sent with it.
+    """
+    with yt_dlp.YoutubeDL({'format': 'bestaudio', 'quiet': True}) as ydl:
+        info = ydl.extract_info('https://www.youtube.com/watch?v=' + YTID, download=False)
+    return info['url'], info.get('http_headers', {})
+
+
+def fetch_segment(url: str, out_path: str, start: float, end: float, headers: dict = None) -> None:
+    """
+    Read only the [start, end] segment of the media at `url` and save it to out_path, in one ffmpeg pass.
+
+    `ss` and `to` are given as input options, so ffmpeg seeks in the input (with HTTP range requests for a remote
+    file) instead of reading and decoding it from the beginning.
+    """
+    options = {'ss': start, 'to': end}
+    if headers:
+        options['headers'] = ''.join('%s: %s\r\n' % item for item in headers.items())
+    ffmpeg.input(url, **options).output(out_path).run(quiet=True)
+
+
+def download_segment(YTID: str, path: str, start: float, end: float) -> None:
+    """
+    Segment-only alternative to download_audio() followed by cut_audio(): resolve the audio stream of the video and
+    fetch only [start, end] into `path`, without an intermediate full mp3. Like download_audio(), nothing is done if
+    `path` already exists.
+    """
+    if exists(path):
+        return
+
+    url, headers = stream_url(YTID)
+    fetch_segment(url, path, start, end, headers)
+
+
+def local_downloader(source_dir: str) -> Callable[[str, str], None]:
+    """
+    Return a stand-in for download_audio() that copies <source_dir>/<YTID>.mp3 to `path` instead of downloading it,
+    to run the pipeline offline. A missing file raises FileNotFoundError, like a video that cannot be downloaded.
+    """
+    def download(YTID: str, path: str) -> None:
+        if exists(path):
+            return
+        shutil.copyfile(join(source_dir, YTID + ".mp3"), path)
 
+    return download
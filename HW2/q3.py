@@ -1,27 +1,69 @@
 import re
 import os
-import pandas as pd
+import json
+import queue
+import threading
+import time
+import warnings
+from contextlib import contextmanager
 from tqdm import tqdm
+from labels import LabelIndex
 from q2 import download_audio, cut_audio
-from typing import List
+from ontology import get_ontology
+from manifest import Manifest, csv_signature, CUT, DOWNLOADED, FAILED
+from audio_store import AudioStore, link_or_copy
+from snapshot import read_csv_snapshot
+from metrics import enable, disable, get_metrics, stage
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
 
 
-def filter_df(csv_path: str, label: str) -> List[str]:
+def filter_df(csv_path: str, label: str, include_descendants: bool = False) -> List[str]:
     """
     Write a function that takes the path to the processed csv from q1 (in the notebook) and returns a df of only the rows
     that contain the human readable label passed as argument
 
     For example:
     get_ids("audio_segments_clean.csv", "Speech")
+
+    Labels are compared as exact names using the inverted index persisted next to the csv, so repeated calls do not
+    scan the label column again, and the csv itself is loaded from its columnar snapshot (see read_csv_snapshot())
+    rather than parsed. With `include_descendants=True`, rows labelled with anything below `label` in the ontology are
+    kept as well (e.g. "Human sounds" keeps the "Speech" and "Laughter" rows).
     """
-    df = pd.read_csv(csv_path)
+    df = read_csv_snapshot(csv_path)
+    index = LabelIndex.for_csv(csv_path)
+
+    if include_descendants:
+        # A label outside the ontology has no descendants and is matched on its own, as in contains_label().
+        rows = index.query(any_of=get_ontology().descendants(label) or {label})
+    else:
+        rows = index.rows(label)
 
-    result = df[df['label_names'].str.contains(label)]
+    result = df.iloc[rows]
 
     return result
 
 
-def data_pipeline(csv_path: str, label: str) -> None:
+class Job(NamedTuple):
+    YTID: str
+    start: float
+    end: float
+    raw_file: str
+    cut_file: str
+
+
+def data_pipeline(
+    csv_path: str,
+    label: str,
+    download_workers: int = 1,
+    cut_workers: int = 1,
+    queue_size: int = 8,
+    downloader: Callable[[str, str], None] = download_audio,
+    cutter: Callable[[str, str, float, float], None] = cut_audio,
+    manifest_path: str = None,
+    store: AudioStore = None,
+    metrics_path: str = None,
+) -> None:
     """
     Using your previously created functions, write a function that takes a processed csv and for each video with the given label:
     (don't forget to create the audio/ folder and the associated label folder!).
@@ -33,42 +75,271 @@ def data_pipeline(csv_path: str, label: str) -> None:
     Use tqdm to track the progress of the download process (https://tqdm.github.io/)
 
     Unfortunately, it is possible that some of the videos cannot be downloaded. In such cases, your pipeline should handle the failure by going to the next video with the label.
+
+    Downloads and cuts run in two separate pools of `download_workers` and `cut_workers` threads (see run_jobs()), so
+    the network is used while ffmpeg cuts and vice versa. `downloader` and `cutter` default to download_audio() and
+    cut_audio(); pass e.g. `local_downloader(folder)` to run the pipeline offline.
+
+    With `manifest_path`, the state of every video is recorded in a Manifest so that an interrupted run can be
+    restarted: videos already cut are skipped, failed ones are retried with a backoff, and the jobs are read back from
+    the manifest instead of filtering the csv again (as long as the csv has not changed). Several labels can share
+    one manifest file, each with its own jobs.
+
+    With a `store`, raw downloads and cuts go through the shared AudioStore instead of <label>_raw/, so videos shared
+    with other labels are only downloaded and cut once, and <label>_cut/<ID>.mp3 is a hard link to the stored cut.
+
+    With `metrics_path`, the run is instrumented (see metrics.Metrics) and its report is written to `metrics_path`
+    (JSON) and next to it in the Prometheus text format (.prom).
     """
     raw_path = label + "_raw"
     cut_path = label + "_cut"
 
-    if not os.path.exists(raw_path):
+    if store is None and not os.path.exists(raw_path):
         os.makedirs(raw_path)
 
     if not os.path.exists(cut_path):
         os.makedirs(cut_path)
 
-    df = filter_df(csv_path, label)
+    manifest = None
+    jobs = None
+    if manifest_path is not None:
+        manifest = Manifest(manifest_path, label)
+        source = csv_signature(csv_path) + ":" + label
+        if manifest.source() == source:
+            jobs = [Job(*job) for job in manifest.jobs()]
+
+    if jobs is None:
+        df = filter_df(csv_path, label)
+
+        jobs = []
+        for label_id, start, end in zip(df['# YTID'], df[' start_seconds'], df[' end_seconds']):
+            raw_file = raw_path + "/" + label_id + ".mp3"
+            cut_file = cut_path + "/" + label_id + ".mp3"
+            jobs.append(Job(label_id, start, end, raw_file, cut_file))
+
+        if manifest is not None:
+            manifest.add(jobs)
+            manifest.set_source(source)
+
+    if manifest is not None:
+        jobs = manifest.runnable(jobs)
+
+    try:
+        with recording(metrics_path):
+            run_jobs(jobs, download_workers, cut_workers, queue_size, downloader, cutter, manifest, store)
+    finally:
+        if manifest is not None:
+            manifest.close()
+
+
+def plan_pipeline(
+    csv_path: str, labels: Iterable[str], include_descendants: bool = False
+) -> Tuple[List[Job], Dict[str, List[str]]]:
+    """
+    Plan the work of data_pipeline() for several labels at once, from a single read of the csv.
+
+    Every video with at least one of the `labels` gets exactly one Job, downloaded to and cut into the folders of the
+    first of its labels (in the order of `labels`). The second value maps the YTID of each video with several labels
+    to the cut files of its other labels, which are then linked to the first cut instead of being cut again. A label
+    that no row has (e.g. misspelt, or outside the ontology) plans no job, with a warning.
+    """
+    df = read_csv_snapshot(csv_path, columns=['# YTID', ' start_seconds', ' end_seconds'])
+    index = LabelIndex.for_csv(csv_path)
+    ids = df['# YTID'].values
+    starts = df[' start_seconds'].values
+    ends = df[' end_seconds'].values
+
+    jobs = {}
+    fanout = {}
+    for label in labels:
+        if include_descendants:
+            rows = index.query(any_of=get_ontology().descendants(label) or {label})
+        else:
+            rows = index.rows(label)
+        if len(rows) == 0:
+            # Most likely a typo: say so rather than silently planning nothing.
+            warnings.warn("no row of %s has the label %r" % (csv_path, label))
+            continue
 
-    for i in tqdm(range(len(df))):
-        row = df.iloc[i]
-        label_id = row['# YTID']
-        start = row[' start_seconds']
-        end = row[' end_seconds']
+        for row in rows:
+            label_id = ids[row]
+            cut_file = label + "_cut/" + label_id + ".mp3"
+            if row in jobs:
+                fanout.setdefault(label_id, []).append(cut_file)
+            else:
+                jobs[row] = Job(label_id, starts[row], ends[row], label + "_raw/" + label_id + ".mp3", cut_file)
+
+    return list(jobs.values()), fanout
+
+
+def data_pipeline_many(
+    csv_path: str,
+    labels: Iterable[str],
+    download_workers: int = 1,
+    cut_workers: int = 1,
+    queue_size: int = 8,
+    downloader: Callable[[str, str], None] = download_audio,
+    cutter: Callable[[str, str, float, float], None] = cut_audio,
+    store: AudioStore = None,
+    include_descendants: bool = False,
+    metrics_path: str = None,
+) -> Dict[str, int]:
+    """
+    Run data_pipeline() for every label of `labels` with a single plan (see plan_pipeline()): the csv is read once and
+    each video is downloaded and cut once, however many of the labels it has. Its cut is then linked (or copied) into
+    the <label>_cut/ folder of each of its other labels.
 
-        raw_file = raw_path + "/" + label_id + ".mp3"
-        cut_file = cut_path + "/" + label_id + ".mp3"
+    The arguments are those of data_pipeline(). Returns the number of files in <label>_cut/ for each label.
+    """
+    labels = list(dict.fromkeys(labels))
+    jobs, fanout = plan_pipeline(csv_path, labels, include_descendants)
 
-        try:
-            download_audio(label_id, raw_file)
+    for label in labels:
+        if store is None and not os.path.exists(label + "_raw"):
+            os.makedirs(label + "_raw")
+        if not os.path.exists(label + "_cut"):
+            os.makedirs(label + "_cut")
 
-        except Exception as e:
-            print(e)
-            continue
+    with recording(metrics_path):
+        run_jobs(jobs, download_workers, cut_workers, queue_size, downloader, cutter, store=store)
 
+    for job in jobs:
+        if job.YTID in fanout and os.path.exists(job.cut_file):
+            for cut_file in fanout[job.YTID]:
+                link_or_copy(job.cut_file, cut_file)
 
-        cut_audio(raw_file, cut_file, start, end)
+    return {label: len(os.listdir(label + "_cut")) for label in labels}
 
 
+@contextmanager
+def recording(metrics_path: str = None):
+    """
+    Record the metrics of the enclosed block and write them to `metrics_path` (see Metrics.write()). Metrics already
+    enabled by the caller are used and left enabled; otherwise they are only enabled for the block. Does nothing if
+    `metrics_path` is None.
+    """
+    if metrics_path is None:
+        yield
+        return
+
+    previous = get_metrics()
+    metrics = previous if previous is not None else enable()
+    try:
+        yield
+    finally:
+        metrics.write(metrics_path)
+        if previous is None:
+            disable()
+
+
+def run_jobs(
+    jobs: List[Job],
+    download_workers: int = 1,
+    cut_workers: int = 1,
+    queue_size: int = 8,
+    downloader: Callable[[str, str], None] = download_audio,
+    cutter: Callable[[str, str, float, float], None] = cut_audio,
+    manifest: Manifest = None,
+    store: AudioStore = None,
+) -> None:
+    """
+    Download then cut every job, with downloads and cuts running concurrently in two thread pools.
 
+    Downloaded jobs wait in a queue of at most `queue_size` jobs for a cut worker: when the cuts fall behind, the
+    download workers block instead of filling the disk with raw files. A job whose download or cut fails is reported
+    and skipped. The progress bar advances once per finished job.
 
+    If a `manifest` is given, the state of each job is recorded in it as it progresses. If a `store` is given, raw
+    files and cuts are taken from (or added to) it, and cut files are materialised from it.
 
-def rename_files(path_cut: str, csv_path: str) -> None:
+    When metrics are enabled (see metrics.enable()), each job records the "pipeline.download", "pipeline.queue_wait"
+    and "pipeline.cut" stages, and "pipeline.job" from the start of its download to the end of its cut.
+    """
+    pending = queue.Queue()
+    downloaded = queue.Queue(maxsize=queue_size)
+    progress = tqdm(total=len(jobs))
+
+    for job in jobs:
+        pending.put(job)
+
+    def download_worker():
+        while True:
+            try:
+                job = pending.get_nowait()
+            except queue.Empty:
+                return
+            started = time.perf_counter()
+            try:
+                with stage("pipeline.download", job.YTID):
+                    if store is not None:
+                        # Pinned until the cut worker is done with it, so that eviction cannot drop a raw file
+                        # waiting in the queue.
+                        store.fetch(job.YTID, downloader, pin=True)
+                    else:
+                        downloader(job.YTID, job.raw_file)
+            except Exception as e:
+                print(e)
+                if manifest is not None:
+                    manifest.mark(job.YTID, FAILED, "download: %r" % e)
+                progress.update()
+                continue
+            if manifest is not None:
+                manifest.mark(job.YTID, DOWNLOADED)
+            downloaded.put((job, started, time.perf_counter()))
+
+    def cut_worker():
+        while True:
+            item = downloaded.get()
+            if item is None:
+                return
+            job, started, ready = item
+            metrics = get_metrics()
+            if metrics is not None:
+                metrics.record("pipeline.queue_wait", time.perf_counter() - ready, job.YTID)
+            try:
+                with stage("pipeline.cut", job.YTID):
+                    if store is not None:
+                        try:
+                            stored = store.cut(job.YTID, job.start, job.end, cutter, downloader, pin=True)
+                            try:
+                                store.materialise(stored, job.cut_file)
+                            finally:
+                                store.unpin(store.cut_key(job.YTID, job.start, job.end))
+                        finally:
+                            store.unpin(store.raw_key(job.YTID))
+                    else:
+                        cutter(job.raw_file, job.cut_file, job.start, job.end)
+            except Exception as e:
+                print(e)
+                if manifest is not None:
+                    manifest.mark(job.YTID, FAILED, "cut: %r" % e)
+            else:
+                if manifest is not None:
+                    manifest.mark(job.YTID, CUT)
+                if metrics is not None:
+                    metrics.record("pipeline.job", time.perf_counter() - started, job.YTID)
+            progress.update()
+
+    download_threads = [threading.Thread(target=download_worker) for _ in range(download_workers)]
+    cut_threads = [threading.Thread(target=cut_worker) for _ in range(cut_workers)]
+    for thread in download_threads + cut_threads:
+        thread.start()
+
+    for thread in download_threads:
+        thread.join()
+    for _ in cut_threads:
+        downloaded.put(None)
+    for thread in cut_threads:
+        thread.join()
+
+    progress.close()
+
+
+# "<ID>.mp3", where the ID itself may contain dots or even ".mp3": only the last ".mp3" is the extension.
+CUT_FILE_PATTERN = re.compile(r"^(?P<YTID>.+)\.mp3$")
+
+
+def rename_files(path_cut: str, csv_path: str, dry_run: bool = False, log_path: str = None) -> None:
     """
     Suppose we now want to rename the files we've downloaded in `path_cut` to include the start and end times as well as length of the segment. While
     this could have been done in the data_pipeline() function, suppose we forgot and don't want to download everything again.
@@ -80,24 +351,89 @@ def rename_files(path_cut: str, csv_path: str) -> None:
     "--BfvyPmVMo.mp3" -> "--BfvyPmVMo_20_30_10.mp3"
 
     ## BE WARY: Assume that the YTID can contain special characters such as '.' or even '.mp3' ##
+
+    The renames are planned first (see plan_renames()) and then applied together (see apply_renames()). With
+    `dry_run=True` the plan is only printed. With `log_path`, the renames are journaled so that rollback_renames() can
+    undo them later.
+    """
+    plan = plan_renames(path_cut, csv_path)
+
+    if dry_run:
+        for old_name, new_name in plan:
+            print(old_name, "->", new_name)
+        return
+
+    apply_renames(path_cut, plan, log_path)
+
+
+def plan_renames(path_cut: str, csv_path: str) -> List[Tuple[str, str]]:
+    """
+    Return the (old name, new name) pairs that rename_files() would apply in `path_cut`.
+
+    The csv is indexed by YTID once, so each file is a dictionary lookup instead of a scan of the csv. Files that are
+    not "<ID>.mp3" for an ID of the csv (such as files already renamed) are left out, which makes renaming twice a
+    no-op.
     """
+    df = read_csv_snapshot(csv_path, columns=['# YTID', ' start_seconds', ' end_seconds'])
+    segments = dict(zip(df['# YTID'], zip(df[' start_seconds'], df[' end_seconds'])))
 
-    df = pd.read_csv(csv_path)
-    files = os.listdir(path_cut)
+    plan = []
+    for file in os.listdir(path_cut):
+        match = CUT_FILE_PATTERN.match(file)
+        if match is None or match.group("YTID") not in segments:
+            continue
 
-    for i in range(len(files)):
-        file = files[i]
-        label_id = file.split(".")[0]
-        row = df[df['# YTID'] == label_id]
-        start = row[' start_seconds']
-        end = row[' end_seconds']
+        label_id = match.group("YTID")
+        start, end = segments[label_id]
         length = end - start
 
         new_name = label_id + "_" + str(int(start)) + "_" + str(int(end)) + "_" + str(int(length)) + ".mp3"
+        plan.append((file, new_name))
+
+    return plan
+
 
-        os.rename(path_cut + "/" + file, path_cut + "/" + new_name)
+def apply_renames(path_cut: str, plan: List[Tuple[str, str]], log_path: str = None) -> None:
+    """
+    Apply the renames of `plan` in `path_cut`, all or nothing.
 
+    Before anything is renamed, the plan is checked for targets that already exist or are used twice, and written to
+    `log_path` (one JSON [old, new] pair per line) if given. If a rename fails, the renames already done are undone
+    in reverse order before the error is raised.
+    """
+    sources = {old_name for old_name, _ in plan}
+    targets = set()
+    for _, new_name in plan:
+        if new_name in targets or (new_name not in sources and os.path.exists(os.path.join(path_cut, new_name))):
+            raise FileExistsError(os.path.join(path_cut, new_name))
+        targets.add(new_name)
+
+    if log_path is not None:
+        with open(log_path, "w") as f:
+            for pair in plan:
+                f.write(json.dumps(pair) + "\n")
+
+    done = []
+    try:
+        for old_name, new_name in plan:
+            os.rename(os.path.join(path_cut, old_name), os.path.join(path_cut, new_name))
+            done.append((old_name, new_name))
+    except OSError:
+        for old_name, new_name in reversed(done):
+            os.rename(os.path.join(path_cut, new_name), os.path.join(path_cut, old_name))
+        raise
+
+
+def rollback_renames(path_cut: str, log_path: str) -> None:
+    """
+    Undo the renames journaled in `log_path` by apply_renames(). Renames that were not applied are skipped.
+    """
+    with open(log_path) as f:
+        plan = [json.loads(line) for line in f if line.strip()]
 
+    for old_name, new_name in reversed(plan):
+        if os.path.exists(os.path.join(path_cut, new_name)):
+            os.rename(os.path.join(path_cut, new_name), os.path.join(path_cut, old_name))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from typing import List, Sequence
+
+
+# Bump whenever the layout of the snapshot folders changes.
+SNAPSHOT_VERSION = 1
+
+
+def read_csv_snapshot(
+    csv_path: str, columns: Sequence[str] = None, parse_dates: Sequence = (), categorical: bool = False
+) -> pd.DataFrame:
+    """
+    Same as pd.read_csv(csv_path, parse_dates=parse_dates)[columns], read from a typed columnar snapshot of the csv
+    instead of parsing it. Like indexing with `columns` (and unlike usecols), the columns come in the order given.
+
+    The first call parses the whole csv and writes the snapshot to `<csv_path>.snapshot/`: one .npy file per column,
+    with text columns stored as integer codes plus a dictionary of their distinct values. Later calls only load the
+    requested `columns`, and numeric and date columns are memory-mapped rather than read. With `categorical=True`,
+    text columns are returned as pd.Categorical instead of being expanded back to strings.
+
+    Like the ontology cache, the snapshot is keyed by the SHA-1 of the csv, which is only computed again when the
+    size or modification time of the csv differ from the ones recorded in the snapshot.
+    """
+    snapshot_path = csv_path + ".snapshot"
+    options = [str(column) for column in parse_dates]
+    meta = _read_meta(snapshot_path, csv_path, options)
+
+    if meta is None:
+        df = pd.read_csv(csv_path, parse_dates=list(parse_dates) or None)
+        meta = _write_snapshot(snapshot_path, csv_path, options, df)
+        if meta is None:
+            return df if columns is None else df[list(columns)]
+
+    by_name = {column["name"]: column for column in meta["columns"]}
+    names = [column["name"] for column in meta["columns"]] if columns is None else list(columns)
+    missing = [name for name in names if name not in by_name]
+    if missing:
+        raise KeyError("%s not in %s" % (missing, csv_path))
+
+    data = {name: _load_column(snapshot_path, by_name[name], categorical) for name in names}
+    return pd.DataFrame(data, columns=names, copy=False)
+
+
+def _load_column(snapshot_path: str, column: dict, categorical: bool):
+    # A copy-on-write memory map, seen as a plain ndarray: the file is only paged in as the column is used, and
+    # writes to the DataFrame stay in memory instead of failing or reaching the snapshot.
+    values = np.load(os.path.join(snapshot_path, column["file"]), mmap_mode="c").view(np.ndarray)
+    if column["kind"] != "text":
+        return pd.Series(values, dtype=column["dtype"], copy=False)
+
+    categories = np.load(os.path.join(snapshot_path, column["categories"]))
+    categories = pd.Index(categories, dtype=column["dtype"])
+    if categorical:
+        return pd.Categorical.from_codes(values, categories=categories)
+    return pd.Series(categories.take(values, allow_fill=True, fill_value=np.nan), copy=False)
+
+
+def _read_meta(snapshot_path: str, csv_path: str, options: List[str]):
+    meta_path = os.path.join(snapshot_path, "meta.json")
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("version") != SNAPSHOT_VERSION or meta.get("parse_dates") != options:
+        return None
+
+    stat = os.stat(csv_path)
+    if (meta["size"], meta["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+        return meta
+    if meta["sha1"] == _sha1(csv_path):
+        meta.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        _write_json(meta_path, meta)
+        return meta
+    return None
+
+
+def _write_snapshot(snapshot_path: str, csv_path: str, options: List[str], df: pd.DataFrame):
+    # Build the snapshot in a temporary folder and move it in place once complete, so that a reader never sees a
+    # partial snapshot. A read-only data folder simply means running without a snapshot.
+    stat = os.stat(csv_path)
+    tmp_path = "%s.%d.tmp" % (snapshot_path, os.getpid())
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "sha1": _sha1(csv_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "parse_dates": options,
+        "rows": len(df),
+        "columns": [],
+    }
+    try:
+        os.makedirs(tmp_path, exist_ok=True)
+        for i, name in enumerate(df.columns):
+            series = df[name]
+            column = {"name": name, "file": "%d.npy" % i, "dtype": str(series.dtype)}
+            if series.dtype.kind in "biufcmM":
+                column["kind"] = "array"
+                np.save(os.path.join(tmp_path, column["file"]), series.to_numpy())
+            else:
+                codes, uniques = pd.factorize(series)
+                column.update(kind="text", categories="%d.categories.npy" % i)
+                np.save(os.path.join(tmp_path, column["file"]), codes.astype(np.int32))
+                np.save(os.path.join(tmp_path, column["categories"]), np.asarray(uniques, dtype=str))
+            meta["columns"].append(column)
+        _write_json(os.path.join(tmp_path, "meta.json"), meta)
+
+        if os.path.exists(snapshot_path):
+            shutil.rmtree(snapshot_path)
+        os.replace(tmp_path, snapshot_path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        return None
+    return meta
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,103 @@
+"""
+AsyncDownloader against a local HTTP stand-in that adds latency to every request and fails some of them, compared
+with downloading the same files one at a time on fresh connections.
+
+    python benchmarks/bench_async_download.py [files] [latency_seconds] [failure_rate]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from common import HW2, use_homework
+
+use_homework(HW2)
+
+from async_download import AsyncDownloader  # noqa: E402
+
+
+class FlakyHandler(SimpleHTTPRequestHandler):
+    """
+    Keep-alive file server that waits `latency` seconds before answering and answers 503 to a `failure_rate` fraction
+    of the requests.
+    """
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.05
+    failure_rate = 0.1
+    connections = set()
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        with self.lock:
+            FlakyHandler.connections.add(self.client_address)
+        time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        super().do_GET()
+
+
+def main():
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    FlakyHandler.latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    FlakyHandler.failure_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    random.seed(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source")
+        os.makedirs(source)
+        ids = ["video%04d" % i for i in range(n_files)]
+        for YTID in ids:
+            with open(os.path.join(source, YTID + ".mp3"), "wb") as f:
+                f.write(os.urandom(256 * 1024))
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), lambda *args: FlakyHandler(*args, directory=source))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = "http://127.0.0.1:%d/" % server.server_address[1]
+
+        FlakyHandler.connections = set()
+        start = time.perf_counter()
+        ok = 0
+        for YTID in ids:
+            try:
+                with urllib.request.urlopen(base + YTID + ".mp3") as response:
+                    response.read()
+                ok += 1
+            except OSError:
+                pass
+        elapsed = time.perf_counter() - start
+        print(f"sequential urllib : {elapsed:.2f}s, {ok}/{n_files} ok, {len(FlakyHandler.connections)} connections")
+
+        async def run():
+            async with AsyncDownloader(
+                os.path.join(tmp, "out"), max_in_flight=16, retries=3, retry_delay=0.05,
+                resolve=lambda YTID: (base + YTID + ".mp3", {}, "mp3"),
+            ) as downloader:
+                return await downloader.download_many(ids)
+
+        FlakyHandler.connections = set()
+        start = time.perf_counter()
+        results = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+        ok = sum(result.ok for result in results)
+        retried = sum(result.attempts > 1 for result in results)
+        print(f"AsyncDownloader   : {elapsed:.2f}s, {ok}/{n_files} ok ({retried} after retries), "
+              f"{len(FlakyHandler.connections)} connections")
+
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
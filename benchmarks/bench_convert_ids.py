@@ -0,0 +1,47 @@
+"""
+Scaling of convert_ids_parallel() from 1 to N worker processes on a synthetic positive_labels column.
+
+    python benchmarks/bench_convert_ids.py [rows] [max_workers]
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+from common import HW2, best_of, use_homework
+
+use_homework(HW2)
+
+from ontology import get_ontology  # noqa: E402
+from q1 import convert_ids_parallel, convert_ids_series  # noqa: E402
+
+
+def synthetic_labels(n_rows: int, seed: int = 0) -> pd.Series:
+    """
+    `n_rows` label strings of 1 to 4 random ontology IDs, so that almost every row is distinct.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.array(get_ontology().ids, dtype=object)
+    picks = rng.integers(0, len(ids), size=(n_rows, 4))
+    lengths = rng.integers(1, 5, size=n_rows)
+    return pd.Series([",".join(ids[row[:n]]) for row, n in zip(picks, lengths)], name=" positive_labels")
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    labels = synthetic_labels(n_rows)
+
+    serial = best_of(lambda: convert_ids_series(labels), repeat=1)
+    print(f"convert_ids_series     : {serial:.2f}s")
+
+    workers = 1
+    while workers <= max_workers:
+        elapsed = best_of(lambda: convert_ids_parallel(labels, workers=workers), repeat=1)
+        print(f"workers={workers:<3}            : {elapsed:.2f}s ({serial / elapsed:.2f}x)")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
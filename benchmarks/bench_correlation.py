@@ -0,0 +1,61 @@
+"""
+Pairwise-complete Pearson correlation between stations: the matrix version (pairwise_correlation) versus one call to
+correlation() per pair through compute_pairwise(), on a stations x days table with missing values. The per-pair
+version is timed on a subset of the stations and scaled to the number of pairs of the full table.
+
+    python benchmarks/bench_correlation.py [stations] [days] [workers]
+"""
+
+import sys
+import warnings
+import numpy as np
+import pandas as pd
+
+from common import HW1, best_of, use_homework
+
+use_homework(HW1)
+
+from monthly_totals import compute_pairwise, correlation, pairwise_correlation  # noqa: E402
+
+
+def synthetic_table(n_stations: int, n_days: int, missing: float = 0.1, seed: int = 0) -> np.ndarray:
+    """
+    Daily precipitation of `n_stations` stations over `n_days` days, correlated through a shared regional signal, with
+    a fraction `missing` of NaN.
+    """
+    rng = np.random.default_rng(seed)
+    regional = rng.gamma(0.5, 6.0, size=n_days)
+    table = 0.5 * regional + rng.gamma(0.5, 3.0, size=(n_stations, n_days))
+    table[rng.random(table.shape) < missing] = np.nan
+    return table
+
+
+def main():
+    n_stations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_days = int(sys.argv[2]) if len(sys.argv) > 2 else 20 * 365
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    table = synthetic_table(n_stations, n_days)
+    n_pairs = n_stations * (n_stations - 1) // 2
+
+    subset = min(n_stations, 100)
+    subset_pairs = subset * (subset - 1) // 2
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        per_pair = best_of(lambda: compute_pairwise(pd.DataFrame(table[:subset]), correlation), repeat=1)
+    estimate = per_pair / subset_pairs * n_pairs
+
+    matrix = best_of(lambda: pairwise_correlation(table, workers=workers), repeat=1)
+
+    reference = np.asarray(compute_pairwise(pd.DataFrame(table[:subset]), correlation), dtype=float)
+    result = pairwise_correlation(table[:subset])
+    np.fill_diagonal(result, 0)
+    error = np.nanmax(np.abs(result - reference))
+
+    print(f"{n_stations} stations x {n_days} days, {n_pairs} pairs")
+    print(f"correlation() per pair : {estimate:.1f}s (estimated from {subset} stations: {per_pair:.2f}s)")
+    print(f"pairwise_correlation   : {matrix:.2f}s ({estimate / matrix:.0f}x)")
+    print(f"max difference         : {error:.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+One ffmpeg process per segment (cut_audio) versus cut_audio_batch, with and without stream copy, on generated test
+tones.
+
+    python benchmarks/bench_cut_batch.py [inputs] [segments_per_input]
+
+Requires the ffmpeg binary.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import ffmpeg
+
+from common import HW2, use_homework
+
+use_homework(HW2)
+
+from q2 import CutJob, cut_audio_batch  # noqa: E402
+
+
+def make_corpus(folder: str, n_inputs: int, duration: int = 120) -> list:
+    paths = []
+    for i in range(n_inputs):
+        path = os.path.join(folder, "tone_%d.mp3" % i)
+        subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", f"sine=frequency={220 + 20 * i}:duration={duration}",
+             path],
+            check=True,
+        )
+        paths.append(path)
+    return paths
+
+
+def main():
+    n_inputs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    n_segments = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = make_corpus(tmp, n_inputs)
+
+        def jobs(tag):
+            return [
+                CutJob(path, os.path.join(tmp, "%s_%d_%d.mp3" % (tag, i, k)), 10.0 * k, 10.0 * k + 10)
+                for i, path in enumerate(inputs)
+                for k in range(n_segments)
+            ]
+
+        start = time.perf_counter()
+        for job in jobs("single"):
+            # Same as cut_audio(), quieted.
+            ffmpeg.input(job.in_path, ss=job.start, to=job.end).output(job.out_path).run(quiet=True)
+        single = time.perf_counter() - start
+        print(f"cut_audio, one process per segment : {single:.2f}s")
+
+        for copy in (False, True):
+            start = time.perf_counter()
+            reports = cut_audio_batch(jobs("batch_copy" if copy else "batch_encode"), copy=copy)
+            elapsed = time.perf_counter() - start
+            modes = {report["mode"] for report in reports}
+            errors = sum(report["error"] is not None for report in reports)
+            print(f"cut_audio_batch(copy={copy!s:<5})       : {elapsed:.2f}s ({single / elapsed:.1f}x, "
+                  f"mode={'/'.join(sorted(modes))}, errors={errors})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Cold-start cost of the ontology: parsing data/ontology.json versus loading the compiled cache next to it.
+
+    python benchmarks/bench_ontology.py
+"""
+
+from common import HW2, best_of, use_homework
+
+use_homework(HW2)
+
+from ontology import ONTOLOGY_PATH, Ontology  # noqa: E402
+
+
+def main():
+    Ontology.load(ONTOLOGY_PATH)  # make sure the cache exists
+
+    json_time = best_of(lambda: Ontology.from_json(ONTOLOGY_PATH), repeat=20)
+    cache_time = best_of(lambda: Ontology.load(ONTOLOGY_PATH), repeat=20)
+
+    print(f"json.load   : {json_time * 1000:.2f} ms")
+    print(f"cache       : {cache_time * 1000:.2f} ms")
+    print(f"speedup     : {json_time / cache_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Bytes transferred and wall time of the two-step path (download the whole file, then cut_audio) versus fetch_segment,
+against a local HTTP server that supports range requests and serves a generated test tone. The tone is an AAC .m4a
+with its index at the start of the file, like the audio streams served by Youtube, so that ffmpeg can seek in it.
+
+    python benchmarks/bench_segment_fetch.py [duration_seconds]
+
+Requires the ffmpeg binary.
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from common import HW2, use_homework
+
+use_homework(HW2)
+
+from q2 import cut_audio, fetch_segment  # noqa: E402
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """
+    SimpleHTTPRequestHandler with support for single "Range: bytes=a-b" requests, counting the body bytes it sends.
+    Responses are throttled to `rate` bytes/sec to behave like a remote server rather than a local disk.
+    """
+
+    bytes_sent = 0
+    rate = 4e6
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        match = re.match(r"bytes=(\d*)-(\d*)$", self.headers.get("Range", ""))
+        if not os.path.isfile(path) or match is None:
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        first = int(match.group(1)) if match.group(1) else 0
+        last = int(match.group(2)) if match.group(2) else size - 1
+        if first >= size:
+            self.send_error(416)
+            return None
+
+        f = open(path, "rb")
+        f.seek(first)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Range", "bytes %d-%d/%d" % (first, last, size))
+        self.send_header("Content-Length", str(last - first + 1))
+        self.end_headers()
+        self.remaining = last - first + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, "remaining", None)
+        sent = 0
+        while remaining is None or sent < remaining:
+            chunk = source.read(16 * 1024 if remaining is None else min(16 * 1024, remaining - sent))
+            if not chunk:
+                break
+            try:
+                outputfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                break
+            sent += len(chunk)
+            time.sleep(len(chunk) / self.rate)
+        with self.lock:
+            RangeRequestHandler.bytes_sent += sent
+
+
+def serve(directory: str) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), lambda *args: RangeRequestHandler(*args, directory=directory)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(label: str, func) -> None:
+    RangeRequestHandler.bytes_sent = 0
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    # Let the server notice connections the client closed early before reading the byte count.
+    time.sleep(1)
+    print(f"{label:<22}: {elapsed:.2f}s, {RangeRequestHandler.bytes_sent / 1e6:.2f} MB transferred")
+
+
+def main():
+    duration = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    start, end = duration / 2, duration / 2 + 10
+
+    with tempfile.TemporaryDirectory() as tmp:
+        media = os.path.join(tmp, "media")
+        os.makedirs(media)
+        subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+             "-c:a", "aac", "-movflags", "+faststart", os.path.join(media, "tone.m4a")],
+            check=True,
+        )
+        server = serve(media)
+        url = "http://127.0.0.1:%d/tone.m4a" % server.server_address[1]
+
+        def two_step():
+            raw = os.path.join(tmp, "raw.m4a")
+            with urllib.request.urlopen(url) as response, open(raw, "wb") as f:
+                shutil.copyfileobj(response, f)
+            cut_audio(raw, os.path.join(tmp, "cut_two_step.mp3"), start, end)
+
+        measure("download + cut_audio", two_step)
+        measure("fetch_segment", lambda: fetch_segment(url, os.path.join(tmp, "cut_segment.mp3"), start, end))
+
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
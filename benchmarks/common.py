@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, NamedTuple, Tuple
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HW1 = os.path.join(ROOT, "HW1")
+HW2 = os.path.join(ROOT, "HW2")
+
+
+def use_homework(path: str) -> None:
+    """
+    Make the modules of a homework folder importable and run from it, since they use paths relative to it
+    (e.g. "data/ontology.json").
+    """
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    os.chdir(path)
+
+
+def best_of(func: Callable, repeat: int = 5) -> float:
+    """
+    Return the best wall time (in seconds) of `repeat` calls to `func`.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Number of synthetic rows (or stations, files...) of each scale, as a multiple of the case's base size.
+SCALES: Dict[str, int] = {"small": 1, "medium": 10, "large": 100}
+
+
+class Case(NamedTuple):
+    """
+    One benchmark of a suite. setup(n) builds the inputs for size `n` (the case's `size` times the scale factor) and
+    returns the arguments of `func`. With `per_call=True`, setup runs before every timed call, for functions that
+    consume their inputs (such as renaming files). `max_scale` skips the larger scales for slow reference versions.
+    """
+    name: str
+    setup: Callable[[int], Tuple]
+    func: Callable[..., Any]
+    size: int
+    per_call: bool = False
+    max_scale: str = "large"
+
+
+def time_case(case: Case, scale: str, repeat: int = 5, min_sample: float = 0.05) -> dict:
+    """
+    Return the best and median wall times (in seconds, per call) of `repeat` samples of `case` at `scale`.
+
+    Like timeit, fast cases are called several times per sample so that a sample lasts at least `min_sample` seconds,
+    which keeps the timings of sub-millisecond cases comparable between runs.
+    """
+    n = case.size * SCALES[scale]
+    args = case.setup(n)
+
+    number = 1
+    if not case.per_call:
+        start = time.perf_counter()
+        case.func(*args)
+        elapsed = time.perf_counter() - start
+        number = max(1, int(min_sample / elapsed)) if elapsed > 0 else 1000
+
+    times = []
+    for i in range(repeat):
+        if case.per_call and i > 0:
+            args = case.setup(n)
+        start = time.perf_counter()
+        for _ in range(number):
+            case.func(*args)
+        times.append((time.perf_counter() - start) / number)
+    times.sort()
+    return {"n": n, "best": times[0], "median": times[len(times) // 2], "repeat": repeat, "number": number}
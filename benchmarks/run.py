@@ -0,0 +1,153 @@
+"""
+Run the benchmark suites (suite_hw1.py, suite_hw2.py) at one or more scales and save the timings as JSON, or compare
+two such files to spot regressions between commits.
+
+    python benchmarks/run.py [--suite hw1 hw2] [--scale small medium large] [--filter NAME] [--repeat N] [--output FILE]
+    python benchmarks/run.py --compare BASELINE.json CURRENT.json [--threshold 1.5]
+
+By default the results go to benchmarks/results/<commit>.json. Each suite runs in its own process, since each one
+runs from its homework folder (see common.use_homework()). --compare exits with status 1 if a case got slower than
+`threshold` times its baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from common import ROOT, SCALES, time_case
+
+SUITES = ("hw1", "hw2")
+RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(suite: str, scales: list, name_filter: str, repeat: int) -> dict:
+    """
+    Time every case of `suite` at each of `scales` in this process and return {case: {scale: timings}}.
+    """
+    module = __import__("suite_" + suite)
+    results = {}
+    for case in module.CASES:
+        if name_filter and name_filter not in case.name:
+            continue
+        for scale in scales:
+            if list(SCALES).index(scale) > list(SCALES).index(case.max_scale):
+                continue
+            timings = time_case(case, scale, repeat)
+            results.setdefault("%s.%s" % (suite, case.name), {})[scale] = timings
+            print(f"{suite}.{case.name:<40} {scale:<7} n={timings['n']:<9} {timings['best'] * 1000:10.2f} ms",
+                  file=sys.stderr)
+    return results
+
+
+def run(suites: list, scales: list, name_filter: str, repeat: int) -> dict:
+    results = {}
+    for suite in suites:
+        # The suite prints its progress on stderr and writes its results to a file, since the functions it times
+        # may print on stdout.
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            out = f.name
+        try:
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", suite, "--worker-output", out,
+                 "--scale", *scales, "--repeat", str(repeat)] + (["--filter", name_filter] if name_filter else []),
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+            with open(out) as f:
+                results.update(json.load(f))
+        finally:
+            os.remove(out)
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(baseline_path: str, current_path: str, threshold: float) -> bool:
+    """
+    Print the ratio of the best times of every case and scale found in both files. Returns True if none of them
+    is slower than `threshold` times the baseline.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+
+    print(f"baseline: {baseline['commit']} ({baseline['date']})")
+    print(f"current : {current['commit']} ({current['date']})")
+    ok = True
+    for name, scales in sorted(current["results"].items()):
+        for scale, timings in scales.items():
+            old = baseline["results"].get(name, {}).get(scale)
+            if old is None:
+                continue
+            ratio = timings["best"] / old["best"]
+            flag = ""
+            if ratio > threshold:
+                flag = "  REGRESSION"
+                ok = False
+            elif ratio < 1 / threshold:
+                flag = "  faster"
+            print(f"{name:<45} {scale:<7} {old['best'] * 1000:10.2f} ms -> {timings['best'] * 1000:10.2f} ms"
+                  f"  {ratio:5.2f}x{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--scale", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--filter", help="only run the cases whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="JSON file for the results (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"))
+    parser.add_argument("--threshold", type=float, default=1.5)
+    parser.add_argument("--worker", choices=SUITES, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(0 if compare(*args.compare, args.threshold) else 1)
+
+    if args.worker:
+        results = run_suite(args.worker, args.scale, args.filter, args.repeat)
+        with open(args.worker_output, "w") as f:
+            json.dump(results, f)
+        return
+
+    report = run(args.suite, args.scale, args.filter, args.repeat)
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS, exist_ok=True)
+        output = os.path.join(RESULTS, "%s%s.json" % ((report["commit"] or "unknown")[:10],
+                                                      "-dirty" if report["dirty"] else ""))
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark cases of HW1 (monthly_totals, np_summary, pd_summary) on synthetic data, run by run.py.
+"""
+
+import numpy as np
+import pandas as pd
+
+from common import HW1, Case, use_homework
+
+use_homework(HW1)
+
+import np_summary  # noqa: E402
+import pd_summary  # noqa: E402
+from monthly_totals import (  # noqa: E402
+    compute_pairwise,
+    compute_pairwise_blocked,
+    compute_pairwise_correlation,
+    compute_pairwise_correlation_pandas,
+    compute_pairwise_distances,
+    euclidean_distances,
+    pivot_months_loops,
+    pivot_months_pandas,
+    pivot_months_vectorized,
+    synthetic_precip_data,
+)
+
+
+def euclidean(xy1, xy2):
+    return np.sqrt((xy1[0] - xy2[0]) ** 2 + (xy1[1] - xy2[1]) ** 2)
+
+
+def precip_data(n_rows: int) -> tuple:
+    return (synthetic_precip_data(n_rows, n_stations=max(10, n_rows // 1000)),)
+
+
+def points(n_stations: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(rng.uniform(0, 100, size=(n_stations, 2)), columns=["x", "y"])
+
+
+def stations(n_stations: int) -> tuple:
+    """
+    One row per station, with the columns used by compute_pairwise_distances().
+    """
+    data = synthetic_precip_data(n_stations * 20, n_stations=n_stations, n_days=1)
+    return (data.drop_duplicates("name"),)
+
+
+def station_days(n_stations: int, n_days: int = 365) -> tuple:
+    """
+    One observation per station and per day (so that the station x date pivot is complete), 5% of them missing.
+    """
+    rng = np.random.default_rng(0)
+    names = np.array(["STATION %04i" % i for i in range(n_stations)], dtype=object)
+    precipitation = np.round(rng.gamma(0.5, 6.0, size=n_stations * n_days), 1)
+    precipitation[rng.random(precipitation.size) < 0.05] = np.nan
+    return (pd.DataFrame({
+        "name": np.repeat(names, n_days),
+        "date": np.tile(pd.date_range("2016-01-01", periods=n_days).values, n_stations),
+        "precipitation": precipitation,
+    }),)
+
+
+def month_arrays(n_stations: int, n_months: int = 12) -> tuple:
+    rng = np.random.default_rng(0)
+    totals = np.round(rng.gamma(0.5, 60.0, size=(n_stations, n_months)), 1)
+    counts = rng.integers(20, 32, size=(n_stations, n_months))
+    return totals, counts
+
+
+def month_frames(n_stations: int) -> tuple:
+    totals, counts = month_arrays(n_stations)
+    index = pd.Index(["STATION %06i" % i for i in range(n_stations)], name="name")
+    columns = ["2016-%02i" % month for month in range(1, 13)]
+    return pd.DataFrame(totals, index, columns), pd.DataFrame(counts, index, columns)
+
+
+CASES = [
+    Case("pivot_months_loops", precip_data, pivot_months_loops, 10_000, max_scale="small"),
+    Case("pivot_months_pandas", precip_data, pivot_months_pandas, 10_000),
+    Case("pivot_months_vectorized", precip_data, pivot_months_vectorized, 10_000),
+    Case("compute_pairwise", lambda n: (points(n), euclidean), compute_pairwise, 50, max_scale="medium"),
+    Case(
+        "compute_pairwise_blocked",
+        lambda n: (points(n), euclidean_distances),
+        compute_pairwise_blocked,
+        50,
+    ),
+    Case("compute_pairwise_distances", stations, compute_pairwise_distances, 20),
+    Case("compute_pairwise_correlation", station_days, compute_pairwise_correlation, 20),
+    Case("compute_pairwise_correlation_pandas", station_days, compute_pairwise_correlation_pandas, 20),
+    Case("np.city_lowest_precipitation", lambda n: month_arrays(n)[:1], np_summary.city_lowest_precipitation, 1000),
+    Case("np.avg_precipitation_month", month_arrays, np_summary.avg_precipitation_month, 1000),
+    Case("np.avg_precipitation_city", month_arrays, np_summary.avg_precipitation_city, 1000),
+    Case("np.quarterly_precipitation", lambda n: month_arrays(n)[:1], np_summary.quarterly_precipitation, 1000),
+    Case("np.summarize_10_years", lambda n: month_arrays(n, 120), np_summary.summarize, 1000),
+    Case("pd.city_lowest_precipitation", lambda n: month_frames(n)[:1], pd_summary.city_lowest_precipitation, 1000),
+    Case("pd.avg_precipitation_month", month_frames, pd_summary.avg_precipitation_month, 1000),
+    Case("pd.avg_precipitation_city", month_frames, pd_summary.avg_precipitation_city, 1000),
+]
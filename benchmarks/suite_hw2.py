@@ -0,0 +1,88 @@
+"""
+Benchmark cases of HW2 (q1 label conversions and queries, q3 filter_df and rename_files) on synthetic data, run by
+run.py. The csv files and the cut folders for rename_files live in a temporary folder.
+"""
+
+import atexit
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+from common import HW2, Case, use_homework
+
+use_homework(HW2)
+
+from bench_convert_ids import synthetic_labels  # noqa: E402
+from q1 import contains_label, convert_id, convert_ids, convert_ids_series, get_correlation  # noqa: E402
+from q3 import filter_df, rename_files  # noqa: E402
+from ontology import get_ontology  # noqa: E402
+
+_tmp = tempfile.TemporaryDirectory()
+atexit.register(_tmp.cleanup)
+_csvs = {}
+
+
+def label_names(n_rows: int) -> pd.Series:
+    return convert_ids_series(synthetic_labels(n_rows))
+
+
+def most_common(names: pd.Series, k: int) -> list:
+    return names.str.split("|").explode().value_counts().index[:k].tolist()
+
+
+def clean_csv(n_rows: int) -> str:
+    """
+    Path of a synthetic audio_segments_clean.csv of `n_rows` rows (with unique YTIDs), written once per size. The
+    label index and snapshot of the csv are built here so that the cases measure repeated calls.
+    """
+    if n_rows not in _csvs:
+        rng = np.random.default_rng(0)
+        alphabet = np.array(list("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_."))
+        ids = pd.unique(np.array(["".join(row) for row in alphabet[rng.integers(0, len(alphabet), (n_rows, 11))]]))
+        labels = synthetic_labels(len(ids))
+        start = rng.integers(0, 600, size=len(ids)).astype(float)
+        df = pd.DataFrame({
+            "# YTID": ids,
+            " start_seconds": start,
+            " end_seconds": start + 10,
+            " positive_labels": labels,
+            "label_count": labels.str.count(",") + 1,
+            "label_names": convert_ids_series(labels),
+        })
+        path = os.path.join(_tmp.name, "segments_%d.csv" % n_rows)
+        df.to_csv(path, index=False)
+        filter_df(path, most_common(df["label_names"], 1)[0])
+        _csvs[n_rows] = path
+    return _csvs[n_rows]
+
+
+def cut_folder(n_files: int) -> tuple:
+    """
+    A fresh folder of `n_files` empty "<YTID>.mp3" files for the YTIDs of clean_csv(n_files).
+    """
+    csv_path = clean_csv(n_files)
+    path_cut = tempfile.mkdtemp(dir=_tmp.name)
+    for label_id in pd.read_csv(csv_path, usecols=["# YTID"])["# YTID"]:
+        open(os.path.join(path_cut, label_id + ".mp3"), "w").close()
+    return path_cut, csv_path
+
+
+def ids(n: int) -> tuple:
+    return (np.random.default_rng(0).choice(get_ontology().ids, size=n).tolist(),)
+
+
+def labels_and_names(n_rows: int, k: int) -> tuple:
+    names = label_names(n_rows)
+    return (names, *most_common(names, k))
+
+
+CASES = [
+    Case("convert_id", ids, lambda ids: [convert_id(ID) for ID in ids], 1000),
+    Case("convert_ids", lambda n: (synthetic_labels(n).tolist(),), lambda rows: [convert_ids(r) for r in rows], 10_000),
+    Case("convert_ids_series", lambda n: (synthetic_labels(n),), convert_ids_series, 10_000),
+    Case("contains_label", lambda n: labels_and_names(n, 1), contains_label, 10_000),
+    Case("get_correlation", lambda n: labels_and_names(n, 2), get_correlation, 10_000),
+    Case("filter_df", lambda n: (clean_csv(n), "Speech"), filter_df, 10_000),
+    Case("rename_files", cut_folder, rename_files, 1000, per_call=True, max_scale="medium"),
+]